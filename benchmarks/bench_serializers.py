@@ -0,0 +1,54 @@
+"""Benchmark of the AMQP message serializers and compressors which are installed.
+
+Run with `python benchmarks/bench_serializers.py [messages]`.
+"""
+
+import datetime
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commons.amqp import serializers  # noqa: E402
+
+
+def event(i):
+    return {
+        "id": uuid.uuid4(),
+        "created": datetime.datetime(2021, 5, 1, 12, 30) + datetime.timedelta(seconds=i),
+        "type": "project.updated",
+        "project": {"id": str(uuid.uuid4()), "title": f"Project {i}", "members": [f"user{j}" for j in range(20)]},
+        "environments": [
+            {"name": f"env{j}", "namespace": f"project-{i}-env{j}", "active": j % 2 == 0} for j in range(5)
+        ],
+    }
+
+
+def bench(name, encoder, messages):
+    start = time.perf_counter()
+    size = 0
+    for message in messages:
+        body, _ = encoder.encode(message)
+        size += len(body)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed / len(messages) * 1000000:8.2f} us/message {size / len(messages):10.1f} bytes/message")
+
+
+if __name__ == "__main__":
+    messages = [event(i) for i in range(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)]
+
+    candidates = [("json", serializers.JSONSerializer)]
+    if serializers.orjson is not None:
+        candidates.append(("orjson", serializers.ORJSONSerializer))
+    if serializers.msgpack is not None:
+        candidates.append(("msgpack", serializers.MsgPackSerializer))
+    compressors = [("", None), ("+zlib", serializers.ZlibCompressor)]
+    if serializers.zstandard is not None:
+        compressors.append(("+zstd", serializers.ZstdCompressor))
+
+    for name, serializer in candidates:
+        for suffix, compressor in compressors:
+            encoder = serializers.MessageEncoder(serializer(), compressor and compressor(), compression_threshold=0)
+            bench(name + suffix, encoder, messages)
@@ -0,0 +1,107 @@
+"""Benchmark of `SpecsParser.read_specs` over a rendered chart with 5000 manifests.
+
+The baseline is the previous implementation, which split the file line by line and searched each document with
+two regular expressions for its kind and source only.
+
+Run with `python benchmarks/bench_specs_parser.py [manifests]`.
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commons.helm.data_classes import SpecsData  # noqa: E402
+from commons.helm.parser import SpecsParser  # noqa: E402
+
+MANIFEST = """---
+# Source: chart/templates/deployment-{i}.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: "service-{i}"
+  namespace: benchmark
+  labels:
+    app.kubernetes.io/name: service-{i}
+spec:
+  replicas: 2
+  template:
+    metadata:
+      labels:
+        app.kubernetes.io/name: service-{i}
+    spec:
+      containers:
+        - name: service
+          image: "registry.example.com/service:{i}"
+          env:
+            - name: BANNER
+              value: "--- not a document marker ---"
+"""
+
+
+document_start_re = re.compile(r"^---(?=\s|$)")
+document_end_re = re.compile(r"^\.\.\.\s*$")
+
+
+def previous_split_documents(lines):
+    document = []
+    for line in lines:
+        if document_start_re.match(line):
+            if document:
+                yield "".join(document)
+            document = [line[3:]]
+        elif document_end_re.match(line):
+            if document:
+                yield "".join(document)
+            document = []
+        else:
+            document.append(line)
+    if document:
+        yield "".join(document)
+
+
+def previous_read_specs(path):
+    """The previous implementation of `SpecsParser.read_specs` for comparison."""
+    name = os.path.basename(path)
+    specs = []
+    source = None
+    with open(path, "r") as f:
+        for spec in previous_split_documents(f):
+            if not spec.strip():
+                continue
+            kindmatch = re.search(r"kind:\s*\w+", spec)
+            kind = kindmatch.group().split(":")[-1].strip() if kindmatch else None
+            sourcematch = re.search(r"Source:\s*[\w/\-\.]*", spec)
+            if sourcematch:
+                source = sourcematch.group().split(":")[-1].strip()
+            specs.append(SpecsData(name=name, source=source, content=spec, kind=kind))
+    return specs
+
+
+def _measure(name, func, *args, repeat=3):
+    best = min(_time(func, *args) for _ in range(repeat))
+    print(f"{name:<30} {best * 1000:10.1f} ms")
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(manifests=5000):
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml") as f:
+        for i in range(manifests):
+            f.write(MANIFEST.format(i=i))
+        f.flush()
+        print(f"{manifests} manifests, {os.path.getsize(f.name) / 1024:.0f} KiB")
+        assert len(SpecsParser.read_specs(f.name)) == len(previous_read_specs(f.name)) == manifests
+        _measure("SpecsParser.read_specs", SpecsParser.read_specs, f.name)
+        _measure("previous read_specs (baseline)", previous_read_specs, f.name)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,72 @@
+"""Benchmark of flattening and merging values trees.
+
+Run with `python benchmarks/bench_values.py`.
+"""
+
+import collections.abc
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commons.helm import utils  # noqa: E402
+
+
+def recursive_flatten(d, parent_key="", sep="."):
+    """The previous, recursive implementation of `utils.flatten` for comparison."""
+    items = []
+    for k, v in d.items():
+        if isinstance(k, str):
+            new_key = parent_key + sep + k if parent_key else k
+        elif isinstance(k, int):
+            new_key = parent_key + "[" + str(k) + "]" if parent_key else k
+        if isinstance(v, collections.abc.MutableMapping):
+            items.extend(recursive_flatten(v, new_key, sep=sep).items())
+        elif isinstance(v, list):
+            items.extend(recursive_flatten(dict(enumerate(v)), new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def deep_tree(depth):
+    tree = {"value": depth}
+    for level in range(depth):
+        tree = {f"level{level}": tree, "items": [{"name": f"item{level}", "value": level}]}
+    return tree
+
+
+def wide_tree(width):
+    return {
+        f"service{i}": {
+            "image": {"repository": f"registry.example.com/service{i}", "tag": str(i)},
+            "env": [{"name": f"VAR{j}", "value": str(j)} for j in range(10)],
+            "labels": {"app.kubernetes.io/name": f"service{i}"},
+        }
+        for i in range(width)
+    }
+
+
+def bench(name, func, *args, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{name:<40} {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    deep = deep_tree(500)
+    wide = wide_tree(2000)
+    bench("flatten deep (500 levels)", utils.flatten, deep)
+    bench("recursive flatten deep (500 levels)", recursive_flatten, deep)
+    bench("flatten wide (2000 services)", utils.flatten, wide)
+    bench("recursive flatten wide (2000 services)", recursive_flatten, wide)
+
+    files = [yaml.dump(wide_tree(200)), yaml.dump({"service1": {"image": {"tag": "latest"}}}), yaml.dump(deep_tree(50))]
+    utils._merged_values_cache.clear()
+    bench("merge 3 files (uncached)", utils.merge_multiple_yaml_files, *files, repeat=1)
+    bench("merge 3 files (cached)", utils.merge_multiple_yaml_files, *files)
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import socket
+from functools import cached_property
+from typing import Iterable, Tuple, Union
+
+import pika
+from pika import BasicProperties
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPChannelError, AMQPConnectionError
+
+from commons.amqp.serializers import Compressor, JSONSerializer, MessageEncoder, Serializer
+
+logger = logging.getLogger(__name__)
+
+
+def _error(error) -> Exception:
+    return error if isinstance(error, Exception) else AMQPConnectionError(error)
+
+
+def _resolve(future: asyncio.Future, result=None):
+    if not future.done():
+        future.set_result(result)
+
+
+async def _until(future: asyncio.Future, closed: asyncio.Future):
+    """Waits for `future`, unless `closed` is resolved with the reason of a closed connection or channel first."""
+    await asyncio.wait([future, closed], return_when=asyncio.FIRST_COMPLETED)
+    if not future.done():
+        future.cancel()
+        raise _error(closed.result())
+    return future.result()
+
+
+class _BasisAsyncAMQPProducer(object):
+    """Publishes messages from an event loop, the counterpart of `_BasisBlockingAMQPProducer`.
+
+    `publish` only puts the message into an outbound buffer and returns, a background task sends it to the broker.
+    Once `max_buffer_size` messages are pending, `publish` waits for the buffer to drain (`publish_nowait` raises
+    `asyncio.QueueFull` instead). The background task only hands the next message to the connection once the
+    connection wrote out its data down to `max_write_buffer_size` bytes, and not while the broker blocks the
+    connection because it runs low on resources. `close` sends all pending messages before closing the connection:
+    producer = AsyncTopicProducer(host, port, exchange="events", routing_key="created")
+    await producer.publish({"id": 1})
+    ...
+    await producer.close()
+
+    If the connection or channel was lost, sending reconnects and retries once, messages which can't be sent are
+    logged and dropped.
+    """
+
+    exchange_type = None
+    durable_exchange = False
+    content_type = "text/json"
+
+    def __init__(
+        self,
+        amqp_host: str,
+        amqp_port: int,
+        amqp_vhost: str = "/",
+        exchange: str = "",
+        routing_key: str = "",
+        amqp_user: str = None,
+        amqp_password: str = None,
+        app_id: str = None,
+        serializer: Serializer = None,
+        compressor: Compressor = None,
+        compression_threshold: int = 1024,
+        max_buffer_size: int = 1000,
+        max_write_buffer_size: int = 1024 * 1024,
+    ):
+        self._host = amqp_host
+        self._port = amqp_port
+        self._vhost = amqp_vhost
+        self._username = amqp_user
+        self._password = amqp_password
+        self._app_id = app_id or socket.gethostname()
+        # `content_type` is the content type of messages encoded by the default serializer
+        self._encoder = MessageEncoder(
+            serializer or JSONSerializer(self.content_type), compressor, compression_threshold, app_id=self._app_id
+        )
+
+        self._exchange = exchange
+        self._routing_key = routing_key
+        self._max_buffer_size = max_buffer_size
+        self._max_write_buffer_size = max_write_buffer_size
+
+        # created on first use, so that they belong to the running loop
+        self._queue = None
+        self._sender = None
+        self._connection = None
+        self._channel = None
+        self._closed = None
+        self._unblocked = None
+
+    @cached_property
+    def _parameters(self) -> pika.ConnectionParameters:
+        if self._username:
+            return pika.ConnectionParameters(
+                host=self._host,
+                port=self._port,
+                virtual_host=self._vhost,
+                credentials=pika.PlainCredentials(self._username, self._password),
+            )
+        return pika.ConnectionParameters(host=self._host, port=self._port, virtual_host=self._vhost)
+
+    async def _connect(self) -> AsyncioConnection:
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        closed = self._closed = loop.create_future()
+        unblocked = self._unblocked = asyncio.Event()
+        unblocked.set()
+
+        def on_close(connection, reason):
+            if self._connection is connection:
+                self._connection = self._channel = None
+            # the sender must not wait for a closed connection
+            unblocked.set()
+            _resolve(closed, reason)
+
+        logger.info(f"Connecting to {self._host}:{self._port}{self._vhost}")
+        connection = AsyncioConnection(
+            self._parameters,
+            on_open_callback=lambda connection: _resolve(opened, connection),
+            on_open_error_callback=lambda connection, error: _resolve(closed, error),
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        connection.add_on_connection_blocked_callback(lambda connection, frame: unblocked.clear())
+        connection.add_on_connection_unblocked_callback(lambda connection, frame: unblocked.set())
+        return await _until(opened, closed)
+
+    async def _open_channel(self, connection: AsyncioConnection):
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        closed = loop.create_future()
+
+        def on_close(channel, reason):
+            if self._channel is channel:
+                self._channel = None
+            _resolve(closed, reason)
+
+        channel = connection.channel(on_open_callback=lambda channel: _resolve(opened, channel))
+        channel.add_on_close_callback(on_close)
+        await _until(opened, closed)
+        if self._exchange != "":
+            declared = loop.create_future()
+            channel.exchange_declare(
+                self._exchange,
+                exchange_type=self.exchange_type,
+                passive=False,
+                durable=self.durable_exchange,
+                callback=lambda frame: _resolve(declared, frame),
+            )
+            # a failed declaration closes the channel
+            await _until(declared, closed)
+        return channel
+
+    async def _get_channel(self):
+        """The channel of this producer, the connection and channel are reopened if they were closed."""
+        if self._connection is None or not self._connection.is_open:
+            self._connection = await self._connect()
+            self._channel = None
+        if self._channel is None or not self._channel.is_open:
+            self._channel = await self._open_channel(self._connection)
+        return self._channel
+
+    def _reset(self):
+        channel, connection = self._channel, self._connection
+        self._channel = self._connection = None
+        if connection is not None and connection.is_open:
+            connection.close()
+        elif channel is not None and channel.is_open:
+            channel.close()
+
+    async def _send(self, routing_key: str, body: bytes, properties: BasicProperties):
+        try:
+            channel = await self._get_channel()
+            channel.basic_publish(self._exchange, routing_key, body, properties)
+        except (AMQPConnectionError, AMQPChannelError) as e:
+            logger.warning(f"Publishing to {self._host}:{self._port}{self._vhost} failed, reconnecting: {e!r}")
+            self._reset()
+            channel = await self._get_channel()
+            channel.basic_publish(self._exchange, routing_key, body, properties)
+
+    def _write_buffer_size(self) -> int:
+        # pika has no public API for the data its transport could not write to the socket yet
+        transport = getattr(self._connection, "_transport", None)
+        return transport.get_write_buffer_size() if transport is not None else 0
+
+    async def _wait_until_writable(self):
+        """Waits while the broker blocks the connection or the connection buffers more than `max_write_buffer_size`
+        bytes. The transport doesn't notify when its buffer drained, hence it is polled.
+        """
+        delay = 0.001
+        while self._connection is not None and self._connection.is_open:
+            if not self._unblocked.is_set():
+                logger.debug(f"Connection to {self._host}:{self._port}{self._vhost} is blocked by the broker")
+                await self._unblocked.wait()
+            elif self._write_buffer_size() > self._max_write_buffer_size:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            else:
+                return
+
+    async def _run(self):
+        while True:
+            await self._wait_until_writable()
+            routing_key, body, properties = await self._queue.get()
+            try:
+                await self._send(routing_key, body, properties)
+            except (AMQPConnectionError, AMQPChannelError) as e:
+                logger.error(f"Dropped message to {self._exchange}/{routing_key}: {e!r}")
+            except Exception:
+                # the sender must keep running, otherwise `flush` and `close` would wait forever
+                logger.exception(f"Dropped message to {self._exchange}/{routing_key}")
+            finally:
+                self._queue.task_done()
+
+    def _buffer(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_buffer_size)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.ensure_future(self._run())
+        return self._queue
+
+    def _encode(self, message: Union[dict, Tuple[str, dict]]) -> Tuple[str, bytes, BasicProperties]:
+        if isinstance(message, tuple):
+            routing_key, message = message
+            return (routing_key, *self._encoder.encode(message))
+        return (self._routing_key, *self._encoder.encode(message))
+
+    async def publish(self, message: dict):
+        await self._buffer().put(self._encode(message))
+
+    def publish_nowait(self, message: dict):
+        """Buffers the message without waiting, raises `asyncio.QueueFull` if the buffer is full."""
+        self._buffer().put_nowait(self._encode(message))
+
+    async def publish_many(self, messages: Iterable[Union[dict, Tuple[str, dict]]]):
+        """Buffers many messages, each one is a dict or a (routing_key, dict) tuple."""
+        queue = self._buffer()
+        for message in messages:
+            await queue.put(self._encode(message))
+
+    async def flush(self):
+        """Waits until all buffered messages were handed to the connection."""
+        if self._queue is not None:
+            if not self._queue.empty():
+                # restarts the sender if it was cancelled
+                self._buffer()
+            await self._queue.join()
+
+    async def close(self):
+        """Sends all buffered messages, then closes the connection."""
+        await self.flush()
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+            self._sender = None
+        connection = self._connection
+        self._reset()
+        if connection is not None:
+            # the close handshake writes out all pending frames first
+            await self._closed
+
+
+class AsyncTopicProducer(_BasisAsyncAMQPProducer):
+    exchange_type = "topic"
@@ -1,15 +1,84 @@
-import json
 import logging
 import socket
+import threading
+from contextlib import contextmanager
 from functools import cached_property
+from typing import Iterable, List, Tuple, Union
 
 import pika as pika
 from pika import BasicProperties, BlockingConnection
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPChannelError, AMQPConnectionError
+
+from commons.amqp.serializers import Compressor, JSONSerializer, MessageEncoder, Serializer
 
 logger = logging.getLogger(__name__)
 
 
+class ConnectionPool(object):
+    """Shares one `BlockingConnection` per broker between all producers of a process.
+
+    A `BlockingConnection` must not be used by several threads at once, hence every thread gets connections of its
+    own. Connections which were closed (e.g. by the broker) are replaced on the next call to `get`.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def _connections(self) -> dict:
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    @staticmethod
+    def _key(parameters: pika.ConnectionParameters) -> tuple:
+        credentials = parameters.credentials
+        return (
+            parameters.host,
+            parameters.port,
+            parameters.virtual_host,
+            getattr(credentials, "username", None),
+            getattr(credentials, "password", None),
+        )
+
+    def get(self, parameters: pika.ConnectionParameters) -> BlockingConnection:
+        key = self._key(parameters)
+        connection = self._connections.get(key)
+        if connection is None or not connection.is_open:
+            logger.info(f"Connecting to {parameters.host}:{parameters.port}{parameters.virtual_host}")
+            connection = self._connections[key] = BlockingConnection(parameters=parameters)
+        return connection
+
+    def discard(self, parameters: pika.ConnectionParameters) -> None:
+        """Closes and forgets the connection of this thread to the broker of `parameters`."""
+        connection = self._connections.pop(self._key(parameters), None)
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except AMQPConnectionError:
+                pass
+
+    def close(self) -> None:
+        """Closes all connections of this thread."""
+        for connection in self._connections.values():
+            if connection.is_open:
+                try:
+                    connection.close()
+                except AMQPConnectionError:
+                    pass
+        self._connections.clear()
+
+
+connection_pool = ConnectionPool()
+
+
 class _BasisBlockingAMQPProducer(object):
+    """Publishes messages on a long-lived channel of a pooled connection, see `ConnectionPool`.
+
+    If the connection or channel was lost, publishing reconnects and retries once.
+    """
+
     exchange_type = None
     durable_exchange = False
     content_type = "text/json"
@@ -25,6 +94,9 @@ class _BasisBlockingAMQPProducer(object):
         amqp_user: str = None,
         amqp_password: str = None,
         app_id: str = None,
+        serializer: Serializer = None,
+        compressor: Compressor = None,
+        compression_threshold: int = 1024,
     ):
         self._host = amqp_host
         self._port = amqp_port
@@ -32,51 +104,165 @@ class _BasisBlockingAMQPProducer(object):
         self._username = amqp_user
         self._password = amqp_password
         self._app_id = app_id or socket.gethostname()
+        # `content_type` is the content type of messages encoded by the default serializer
+        self._encoder = MessageEncoder(
+            serializer or JSONSerializer(self.content_type), compressor, compression_threshold, app_id=self._app_id
+        )
 
         self._exchange = exchange
         self._routing_key = routing_key
+        self._local = threading.local()
 
         if self._exchange != "":
-            self._declare_exchange()
+            # the exchange is declared whenever a channel is opened
+            self._get_channel()
 
     @cached_property
-    def _properties(self):
-        return BasicProperties(content_type=self.content_type, delivery_mode=1, app_id=self._app_id)
-
-    @cached_property
-    def _connection(self) -> BlockingConnection:
-        """This method connects to the broker, returning the connection handle."""
-        logger.info(f"Connecting to {self._host}:{self._port}{self._vhost}")
+    def _parameters(self) -> pika.ConnectionParameters:
         # set amqp credentials
         if self._username:
             credentials = pika.PlainCredentials(self._username, self._password)
             # set amqp connection parameters
-            parameters = pika.ConnectionParameters(
+            return pika.ConnectionParameters(
                 host=self._host,
                 port=self._port,
                 virtual_host=self._vhost,
                 credentials=credentials,
             )
-        else:
-            parameters = pika.ConnectionParameters(
-                host=self._host,
-                port=self._port,
-                virtual_host=self._vhost,
-            )
+        return pika.ConnectionParameters(
+            host=self._host,
+            port=self._port,
+            virtual_host=self._vhost,
+        )
+
+    @property
+    def _connection(self) -> BlockingConnection:
+        """The pooled connection to the broker of this thread."""
+        return connection_pool.get(self._parameters)
+
+    def _get_channel(self, transactional: bool = False) -> BlockingChannel:
+        """The channel of this producer and thread, it is reopened if it or its connection was closed.
 
-        # connect
-        return BlockingConnection(parameters=parameters)
+        A transactional channel is kept separately, since a channel can't leave the transaction mode again.
+        """
+        connection = self._connection
+        channels = self._channels
+        channel = channels.get(transactional)
+        if channel is None or not channel.is_open or channel.connection is not connection:
+            channel = channels[transactional] = connection.channel()
+            if self._exchange != "":
+                self._declare_exchange(channel)
+            if transactional:
+                channel.tx_select()
+        return channel
 
-    def _declare_exchange(self):
-        channel = self._connection.channel()
+    @property
+    def _channels(self) -> dict:
+        if not hasattr(self._local, "channels"):
+            self._local.channels = {}
+        return self._local.channels
+
+    def _declare_exchange(self, channel: BlockingChannel):
         channel.exchange_declare(
             self._exchange, exchange_type=self.exchange_type, passive=False, durable=self.durable_exchange
         )
 
+    def _reset(self, transactional: bool = False):
+        """Drops the channel of this thread and its connection, if that is broken as well."""
+        channel = self._channels.pop(transactional, None)
+        if channel is None or not channel.connection.is_open:
+            connection_pool.discard(self._parameters)
+
+    def _encode(self, messages: Iterable[Union[dict, Tuple[str, dict]]]) -> List[Tuple[str, bytes, BasicProperties]]:
+        result = []
+        for message in messages:
+            if isinstance(message, tuple):
+                routing_key, message = message
+            else:
+                routing_key = self._routing_key
+            result.append((routing_key, *self._encoder.encode(message)))
+        return result
+
+    def _publish(self, bodies: List[Tuple[str, bytes, BasicProperties]]):
+        """Writes all messages to the channel without waiting for the broker."""
+        position = 0
+        try:
+            channel = self._get_channel()
+            for position, (routing_key, body, properties) in enumerate(bodies):
+                channel.basic_publish(self._exchange, routing_key, body, properties)
+        except (AMQPConnectionError, AMQPChannelError) as e:
+            logger.warning(f"Publishing to {self._host}:{self._port}{self._vhost} failed, reconnecting: {e!r}")
+            self._reset()
+            channel = self._get_channel()
+            for routing_key, body, properties in bodies[position:]:
+                channel.basic_publish(self._exchange, routing_key, body, properties)
+
+    def _publish_confirmed(self, bodies: List[Tuple[str, bytes, BasicProperties]]):
+        """Publishes all messages in one transaction, returns once the broker committed it."""
+        try:
+            channel = self._get_channel(transactional=True)
+            for routing_key, body, properties in bodies:
+                channel.basic_publish(self._exchange, routing_key, body, properties)
+            channel.tx_commit()
+        except (AMQPConnectionError, AMQPChannelError) as e:
+            # nothing of an uncommitted transaction was delivered, the whole batch is published again
+            logger.warning(f"Publishing to {self._host}:{self._port}{self._vhost} failed, reconnecting: {e!r}")
+            self._reset(transactional=True)
+            channel = self._get_channel(transactional=True)
+            for routing_key, body, properties in bodies:
+                channel.basic_publish(self._exchange, routing_key, body, properties)
+            channel.tx_commit()
+
     def publish(self, message: dict):
-        # get a new channel
-        channel = self._connection.channel()
-        channel.basic_publish(self._exchange, self._routing_key, json.dumps(message), self._properties)
+        self._publish([(self._routing_key, *self._encoder.encode(message))])
+
+    def publish_many(self, messages: Iterable[Union[dict, Tuple[str, dict]]], confirm: bool = False):
+        """Publishes many messages at once, each one is a dict or a (routing_key, dict) tuple.
+
+        The messages are written back to back without waiting for the broker. With `confirm` this method only
+        returns once the broker accepted all of them: they are published in a single AMQP transaction, which is
+        confirmed with one round trip per batch.
+        """
+        bodies = self._encode(messages)
+        if not bodies:
+            return
+        if confirm:
+            self._publish_confirmed(bodies)
+        else:
+            self._publish(bodies)
+
+    @contextmanager
+    def batch(self, confirm: bool = False):
+        """Collects the messages published within the block and publishes them with `publish_many` at its end:
+        with producer.batch(confirm=True) as batch:
+            batch.publish({"id": 1})
+            batch.publish({"id": 2}, routing_key="other.key")
+
+        Nothing is published if the block raises an exception.
+        """
+        batch = MessageBatch()
+        yield batch
+        self.publish_many(batch.messages, confirm=confirm)
+
+    def close(self):
+        """Closes the channels of this producer in this thread, the pooled connection stays open."""
+        for channel in self._channels.values():
+            if channel.is_open:
+                channel.close()
+        self._channels.clear()
+
+
+class MessageBatch(object):
+    """Messages collected by `_BasisBlockingAMQPProducer.batch`."""
+
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message: dict, routing_key: str = None):
+        self.messages.append(message if routing_key is None else (routing_key, message))
+
+    def __len__(self):
+        return len(self.messages)
 
 
 class TopicProducer(_BasisBlockingAMQPProducer):
@@ -0,0 +1,153 @@
+import json
+import threading
+import zlib
+from functools import cached_property
+from typing import Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from pika import BasicProperties
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+# converts datetimes, UUIDs, decimals etc. to strings for the serializers which can't represent them natively
+_default = DjangoJSONEncoder().default
+
+
+class Serializer:
+    """Turns a message into the body of an AMQP message of `content_type`."""
+
+    content_type = None
+
+    def dumps(self, message) -> bytes:
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    """The standard library encoder, which also handles datetimes, UUIDs and decimals like Django does."""
+
+    content_type = "text/json"
+
+    def __init__(self, content_type: str = None):
+        if content_type:
+            self.content_type = content_type
+
+    def dumps(self, message) -> bytes:
+        return json.dumps(message, cls=DjangoJSONEncoder).encode("utf-8")
+
+
+class ORJSONSerializer(Serializer):
+    """Compact JSON encoded by orjson, which is several times faster than the standard library."""
+
+    content_type = "text/json"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured("ORJSONSerializer requires orjson to be installed")
+
+    def dumps(self, message) -> bytes:
+        return orjson.dumps(message, default=_default)
+
+
+class MsgPackSerializer(Serializer):
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImproperlyConfigured("MsgPackSerializer requires msgpack to be installed")
+
+    def dumps(self, message) -> bytes:
+        return msgpack.packb(message, default=_default, use_bin_type=True)
+
+
+def get_json_serializer() -> Serializer:
+    """Returns the fastest available JSON serializer."""
+    if orjson is not None:
+        return ORJSONSerializer()
+    return JSONSerializer()
+
+
+class Compressor:
+    """Compresses message bodies, `content_encoding` is set on compressed messages."""
+
+    content_encoding = None
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCompressor(Compressor):
+    content_encoding = "deflate"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+
+class ZstdCompressor(Compressor):
+    content_encoding = "zstd"
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise ImproperlyConfigured("ZstdCompressor requires zstandard to be installed")
+        self.level = level
+        # compression contexts must not be shared by threads
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return self._local.compressor.compress(data)
+
+
+class MessageEncoder:
+    """Serializes messages and compresses bodies of at least `compression_threshold` bytes, if a `compressor` is
+    given. Returns the body along with matching `BasicProperties`.
+    """
+
+    def __init__(
+        self,
+        serializer: Serializer = None,
+        compressor: Compressor = None,
+        compression_threshold: int = 1024,
+        app_id: str = None,
+    ):
+        self.serializer = serializer or JSONSerializer()
+        self.compressor = compressor
+        self.compression_threshold = compression_threshold
+        self.app_id = app_id
+
+    @cached_property
+    def properties(self) -> BasicProperties:
+        return BasicProperties(content_type=self.serializer.content_type, delivery_mode=1, app_id=self.app_id)
+
+    @cached_property
+    def compressed_properties(self) -> BasicProperties:
+        return BasicProperties(
+            content_type=self.serializer.content_type,
+            content_encoding=self.compressor.content_encoding,
+            delivery_mode=1,
+            app_id=self.app_id,
+        )
+
+    def encode(self, message) -> Tuple[bytes, BasicProperties]:
+        body = self.serializer.dumps(message)
+        if self.compressor is not None and len(body) >= self.compression_threshold:
+            return self.compressor.compress(body), self.compressed_properties
+        return body, self.properties
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import subprocess
+
+from commons.helm.context_manager import HelmCharts
+from commons.helm.data_classes import DeckData, RenderEnvironment
+from commons.helm.exceptions import HelmChartRenderTimeout
+
+logger = logging.getLogger("projects.helm")
+
+
+async def run(cmd, cwd, env=None, timeout=None) -> subprocess.CompletedProcess:
+    """
+    Executes a command in a directory with a certain environment without blocking the event loop
+
+    stdout and stderr are read concurrently while the process runs. If `timeout` (seconds) expires or the awaiting
+    task is cancelled, the process is killed and `asyncio.TimeoutError` or `asyncio.CancelledError` is raised.
+
+    :returns CompletedProcess
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd, cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except BaseException:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        raise
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout.decode("utf-8"), stderr.decode("utf-8"))
+
+
+class AsyncHelmCharts(HelmCharts):
+    """Renders helm charts on the event loop and provides path to rendered output.
+
+    Can be used as an async context manager:
+    async with AsyncHelmCharts(repository_directory, deck, environment, timeout=60) as dir:
+        for root, dirs, files in os.walk(dir):
+            ...
+
+    or without an output directory: `await AsyncHelmCharts(...).render()`
+
+    Checking the dependencies and preparing sops keys may block and run in the default executor, `helm template`
+    itself runs as an asyncio subprocess. `HelmChartRenderTimeout` is raised if it takes longer than `timeout` seconds.
+    """
+
+    def __init__(self, repository_directory, deck: DeckData, environment: RenderEnvironment, timeout: float = None):
+        super().__init__(repository_directory, deck, environment)
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        command, env = await loop.run_in_executor(None, self._prepare)
+
+        logger.debug(f"running: {command}, in dir {self.repository_directory}")
+        try:
+            process = await run(command, cwd=self.repository_directory, env=env, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._cleanup()
+            raise HelmChartRenderTimeout(f"rendering {self.deck.title} took longer than {self.timeout} seconds")
+        except BaseException:
+            self._cleanup()
+            raise
+        return self._result(process)
+
+    async def __aexit__(self, type, value, traceback):
+        self._cleanup()
+
+    async def render(self) -> str:
+        """Renders the chart without touching the disk, returns the rendered YAML documents."""
+        loop = asyncio.get_running_loop()
+        try:
+            command, env = await loop.run_in_executor(None, self._prepare, False)
+
+            logger.debug(f"running: {command}, in dir {self.repository_directory}")
+            process = await run(command, cwd=self.repository_directory, env=env, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HelmChartRenderTimeout(f"rendering {self.deck.title} took longer than {self.timeout} seconds")
+        finally:
+            self._cleanup()
+        return self._output(process)
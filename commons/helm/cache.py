@@ -0,0 +1,180 @@
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.utils.module_loading import import_string
+
+from commons.helm.conf import config
+from commons.helm.data_classes import SpecsData
+
+logger = logging.getLogger("projects.helm")
+
+# bump this whenever the cached representation of `SpecsData` changes
+RENDER_CACHE_VERSION = 2
+
+
+def render_cache_key(**inputs) -> str:
+    """Returns a digest of all inputs which determine the output of a render."""
+    data = json.dumps({"version": RENDER_CACHE_VERSION, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def get_render_cache() -> Optional["RenderCache"]:
+    """Returns an instance of the render cache configured in `HELM_RENDER_CACHE`, if any."""
+    if config.RENDER_CACHE:
+        return import_string(config.RENDER_CACHE)()
+    return None
+
+
+class RenderCache:
+    """Stores the rendered `SpecsData` of a chart by a key as returned from `render_cache_key`."""
+
+    def get(self, key: str) -> Optional[List[SpecsData]]:
+        raise NotImplementedError
+
+    def set(self, key: str, specs_data: List[SpecsData]) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _dump(specs_data: List[SpecsData]) -> list:
+        return [dataclasses.asdict(specs) for specs in specs_data]
+
+    @staticmethod
+    def _load(data: list) -> List[SpecsData]:
+        return [SpecsData(**specs) for specs in data]
+
+
+class FileSystemRenderCache(RenderCache):
+    """Keeps one JSON file per render in `directory`, least recently used files are evicted above `max_size` bytes."""
+
+    def __init__(self, directory: str = None, max_size: int = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "renders")
+        self.max_size = max_size if max_size is not None else config.RENDER_CACHE_MAX_SIZE
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[SpecsData]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            # the modification time is used for LRU eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return self._load(data)
+
+    def set(self, key: str, specs_data: List[SpecsData]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first, so that concurrent readers never see partial entries
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._dump(specs_data), f)
+        os.replace(temp_path, self._path(key))
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        total_size = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+class DjangoRenderCache(RenderCache):
+    """Stores renders in the Django cache `HELM_RENDER_CACHE_ALIAS`.
+
+    Eviction is left to the cache backend, e.g. `MAX_ENTRIES` of the local memory or file based caches.
+    """
+
+    def __init__(self, alias: str = None, timeout: int = DEFAULT_TIMEOUT):
+        self.cache = caches[alias or config.RENDER_CACHE_ALIAS]
+        self.timeout = timeout
+
+    def _key(self, key: str) -> str:
+        return f"helm-render:{key}"
+
+    def get(self, key: str) -> Optional[List[SpecsData]]:
+        data = self.cache.get(self._key(key))
+        if data is None:
+            return None
+        return self._load(data)
+
+    def set(self, key: str, specs_data: List[SpecsData]) -> None:
+        self.cache.set(self._key(key), self._dump(specs_data), self.timeout)
+
+
+class DependencyCache:
+    """Keeps the resolved dependency archives (`charts/*.tgz`) of charts by the digest of their dependency definitions.
+
+    Archives are hard linked (or copied across file systems) from `directory/<digest>/` into the `charts/` directory
+    of new checkouts. Entries older than `max_age` seconds are resolved again, since version ranges may float.
+    """
+
+    def __init__(self, directory: str = None, max_age: int = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "dependencies")
+        self.max_age = max_age if max_age is not None else config.DEPENDENCY_CACHE_MAX_AGE
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def restore(self, digest: str, charts_dir: str) -> bool:
+        """Links the cached archives for `digest` into `charts_dir`, returns whether there was a usable entry."""
+        path = self._path(digest)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                return False
+            archives = [entry for entry in os.scandir(path) if entry.name.endswith(".tgz")]
+        except FileNotFoundError:
+            return False
+        if not archives:
+            return False
+        os.makedirs(charts_dir, exist_ok=True)
+        for archive in archives:
+            target = os.path.join(charts_dir, archive.name)
+            if os.path.exists(target):
+                continue
+            try:
+                os.link(archive.path, target)
+            except OSError:
+                shutil.copy2(archive.path, target)
+        return True
+
+    def store(self, digest: str, charts_dir: str) -> None:
+        if not os.path.isdir(charts_dir) or os.path.isdir(self._path(digest)):
+            return
+        archives = [entry for entry in os.scandir(charts_dir) if entry.name.endswith(".tgz") and entry.is_file()]
+        if not archives:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # populate a temporary directory first, so that concurrent readers never see partial entries
+        temp_dir = tempfile.mkdtemp(dir=self.directory, prefix=".")
+        for archive in archives:
+            shutil.copy2(archive.path, os.path.join(temp_dir, archive.name))
+        try:
+            os.rename(temp_dir, self._path(digest))
+        except OSError:
+            # another worker stored this digest in the meantime
+            shutil.rmtree(temp_dir, ignore_errors=True)
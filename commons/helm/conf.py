@@ -0,0 +1,126 @@
+import os
+import tempfile
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULTS = {
+    "HELM_CACHE_DIR": os.path.join(tempfile.gettempdir(), "unikube-helm"),
+    "HELM_REPOSITORY_CACHE_ENABLED": False,
+    "HELM_REPOSITORY_CACHE_MAX_SIZE": 2 * 1024 * 1024 * 1024,  # bytes
+    "HELM_REPOSITORY_CACHE_MAX_AGE": 7 * 24 * 60 * 60,  # seconds
+    "HELM_RENDER_MAX_WORKERS": 1,
+    # threads inspecting the files of a checked out deck, they only pay off for large decks on slow file systems
+    "HELM_PARSE_MAX_WORKERS": 1,
+    # dotted path to a `commons.helm.cache.RenderCache`, the render cache is disabled if empty
+    "HELM_RENDER_CACHE": "",
+    "HELM_RENDER_CACHE_MAX_SIZE": 512 * 1024 * 1024,  # bytes
+    "HELM_RENDER_CACHE_ALIAS": "default",
+    "HELM_DEPENDENCY_CACHE_ENABLED": True,
+    "HELM_DEPENDENCY_CACHE_MAX_AGE": 24 * 60 * 60,  # seconds
+    "HELM_RENDER_TIMEOUT": 0,  # seconds, 0 disables the timeout of asynchronous renders
+    "HELM_RENDER_MAX_CONCURRENCY": 8,
+    "HELM_RENDER_TO_STDOUT": True,  # parse the stdout of `helm template` instead of rendering into a directory
+    "HELM_GPG_KEYRING_MAX_AGE": 7 * 24 * 60 * 60,  # seconds
+}
+
+
+def _resolve(namespace, name, default):
+    for resolver in (attrgetter, itemgetter):
+        try:
+            return resolver(name)(namespace)
+        except (TypeError, AttributeError, KeyError, ImproperlyConfigured):
+            pass
+    return default
+
+
+def _cast(value, default):
+    """Values from the environment are always strings, cast them to the type of the default."""
+    if not isinstance(value, str) or default is None or isinstance(default, str):
+        return value
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+class HelmConfig:
+    def __init__(self, **overrides):
+        self.overrides = {k: v for k, v in overrides.items() if v is not None}
+        self.CACHE_DIR = self._resolve("HELM_CACHE_DIR")
+        self.REPOSITORY_CACHE_ENABLED = self._resolve("HELM_REPOSITORY_CACHE_ENABLED")
+        self.REPOSITORY_CACHE_MAX_SIZE = self._resolve("HELM_REPOSITORY_CACHE_MAX_SIZE")
+        self.REPOSITORY_CACHE_MAX_AGE = self._resolve("HELM_REPOSITORY_CACHE_MAX_AGE")
+        self.RENDER_MAX_WORKERS = self._resolve("HELM_RENDER_MAX_WORKERS")
+        self.PARSE_MAX_WORKERS = self._resolve("HELM_PARSE_MAX_WORKERS")
+        self.RENDER_CACHE = self._resolve("HELM_RENDER_CACHE")
+        self.RENDER_CACHE_MAX_SIZE = self._resolve("HELM_RENDER_CACHE_MAX_SIZE")
+        self.RENDER_CACHE_ALIAS = self._resolve("HELM_RENDER_CACHE_ALIAS")
+        self.DEPENDENCY_CACHE_ENABLED = self._resolve("HELM_DEPENDENCY_CACHE_ENABLED")
+        self.DEPENDENCY_CACHE_MAX_AGE = self._resolve("HELM_DEPENDENCY_CACHE_MAX_AGE")
+        self.RENDER_TIMEOUT = self._resolve("HELM_RENDER_TIMEOUT")
+        self.RENDER_MAX_CONCURRENCY = self._resolve("HELM_RENDER_MAX_CONCURRENCY")
+        self.RENDER_TO_STDOUT = self._resolve("HELM_RENDER_TO_STDOUT")
+        self.GPG_KEYRING_MAX_AGE = self._resolve("HELM_GPG_KEYRING_MAX_AGE")
+
+    def _resolve(self, name):
+        unset = object()
+        for namespace in (self.overrides, settings, os.environ, DEFAULTS):
+            value = _resolve(namespace, name, unset)
+            if value is not unset:
+                return _cast(value, DEFAULTS.get(name))
+
+
+config = HelmConfig()
+
+
+def configure(
+    cache_dir=None,
+    repository_cache_enabled=None,
+    repository_cache_max_size=None,
+    repository_cache_max_age=None,
+    render_max_workers=None,
+    parse_max_workers=None,
+    render_cache=None,
+    render_cache_max_size=None,
+    render_cache_alias=None,
+    dependency_cache_enabled=None,
+    dependency_cache_max_age=None,
+    render_timeout=None,
+    render_max_concurrency=None,
+    render_to_stdout=None,
+    gpg_keyring_max_age=None,
+):
+    global config
+    _override = HelmConfig(
+        HELM_CACHE_DIR=cache_dir,
+        HELM_REPOSITORY_CACHE_ENABLED=repository_cache_enabled,
+        HELM_REPOSITORY_CACHE_MAX_SIZE=repository_cache_max_size,
+        HELM_REPOSITORY_CACHE_MAX_AGE=repository_cache_max_age,
+        HELM_RENDER_MAX_WORKERS=render_max_workers,
+        HELM_PARSE_MAX_WORKERS=parse_max_workers,
+        HELM_RENDER_CACHE=render_cache,
+        HELM_RENDER_CACHE_MAX_SIZE=render_cache_max_size,
+        HELM_RENDER_CACHE_ALIAS=render_cache_alias,
+        HELM_DEPENDENCY_CACHE_ENABLED=dependency_cache_enabled,
+        HELM_DEPENDENCY_CACHE_MAX_AGE=dependency_cache_max_age,
+        HELM_RENDER_TIMEOUT=render_timeout,
+        HELM_RENDER_MAX_CONCURRENCY=render_max_concurrency,
+        HELM_RENDER_TO_STDOUT=render_to_stdout,
+        HELM_GPG_KEYRING_MAX_AGE=gpg_keyring_max_age,
+    )
+    config.CACHE_DIR = _override.CACHE_DIR
+    config.REPOSITORY_CACHE_ENABLED = _override.REPOSITORY_CACHE_ENABLED
+    config.REPOSITORY_CACHE_MAX_SIZE = _override.REPOSITORY_CACHE_MAX_SIZE
+    config.REPOSITORY_CACHE_MAX_AGE = _override.REPOSITORY_CACHE_MAX_AGE
+    config.RENDER_MAX_WORKERS = _override.RENDER_MAX_WORKERS
+    config.PARSE_MAX_WORKERS = _override.PARSE_MAX_WORKERS
+    config.RENDER_CACHE = _override.RENDER_CACHE
+    config.RENDER_CACHE_MAX_SIZE = _override.RENDER_CACHE_MAX_SIZE
+    config.RENDER_CACHE_ALIAS = _override.RENDER_CACHE_ALIAS
+    config.DEPENDENCY_CACHE_ENABLED = _override.DEPENDENCY_CACHE_ENABLED
+    config.DEPENDENCY_CACHE_MAX_AGE = _override.DEPENDENCY_CACHE_MAX_AGE
+    config.RENDER_TIMEOUT = _override.RENDER_TIMEOUT
+    config.RENDER_MAX_CONCURRENCY = _override.RENDER_MAX_CONCURRENCY
+    config.RENDER_TO_STDOUT = _override.RENDER_TO_STDOUT
+    config.GPG_KEYRING_MAX_AGE = _override.GPG_KEYRING_MAX_AGE
@@ -2,10 +2,15 @@ import logging
 import os
 import subprocess
 import tempfile
+from typing import List, Optional, Tuple
+
+import yaml
 
 from commons.helm import utils
+from commons.helm.cache import render_cache_key
 from commons.helm.data_classes import DeckData, RenderEnvironment, SopsProviderType
 from commons.helm.exceptions import HelmChartRenderError, HelmDependencyError
+from commons.helm.gpg import KeyringCache
 
 logger = logging.getLogger("projects.helm")
 
@@ -17,6 +22,9 @@ class HelmCharts:
     with HelmCharts(repository_directory, deck) as dir:
         for root, dirs, files in os.walk(dir):
             ...
+
+    `render` renders without an output directory and returns the multi-document stream `helm template` writes to
+    stdout instead, see `SpecsParser.iter_stream_specs`.
     """
 
     def __init__(self, repository_directory, deck: DeckData, environment: RenderEnvironment):
@@ -24,45 +32,120 @@ class HelmCharts:
         self.deck = deck
         self.environment = environment
         self.values_path = environment.values_path
+        self.rendered_chart_dir = None
+        self.override_values_file = None
+
+    def cache_key(self, commit: str) -> Optional[str]:
+        """Digest of every input of the render at `commit` of the repository, see `commons.helm.cache`.
+
+        Decks with sops secrets are never cached: the cache would hand out their decrypted secrets without checking
+        the caller's key and store them in plain text.
+        """
+        if self.deck.sops:
+            return None
+        return render_cache_key(
+            commit=commit,
+            chart=self.deck.dir_path,
+            name=utils.slugify(self.deck.title),
+            values=self.values_path,
+            parameters=utils.get_additional_render_parameters(self.deck, self.environment),
+            helm=utils.get_helm_version(),
+        )
 
     def __enter__(self):
+        command, env = self._prepare()
+
+        # execute command
+        logger.debug(f"running: {command}, in dir {self.repository_directory}")
+        process = utils.run(command, cwd=self.repository_directory, env=env)
+        return self._result(process)
+
+    def __exit__(self, type, value, traceback):
+        self._cleanup()
+
+    def render(self) -> str:
+        """Renders the chart without touching the disk, returns the rendered YAML documents."""
+        try:
+            command, env = self._prepare(output_dir=False)
+
+            logger.debug(f"running: {command}, in dir {self.repository_directory}")
+            process = utils.run(command, cwd=self.repository_directory, env=env)
+        finally:
+            self._cleanup()
+        return self._output(process)
+
+    def _prepare(self, output_dir: bool = True) -> Tuple[List[str], dict]:
+        """Checks the dependencies, creates the output directory (if `output_dir`) and returns the render command and
+        its env.
+        """
         # check dependencies
         directory = os.path.join(self.repository_directory, self.deck.dir_path)
         utils.check_helm_dependencies(directory)
 
-        # create tempdir for output
-        self.rendered_chart_dir = tempfile.TemporaryDirectory()
-        logger.debug("created temporary directory:" + str(self.rendered_chart_dir.name))
+        if output_dir:
+            # create tempdir for output
+            self.rendered_chart_dir = tempfile.TemporaryDirectory()
+            logger.debug("created temporary directory:" + str(self.rendered_chart_dir.name))
 
         # generate command and env
-        output_dir = self.rendered_chart_dir.name
+        output_dir = self.rendered_chart_dir.name if output_dir else None
         # deck.values starts with /. That needs to be excluded.
         values = os.path.join(self.repository_directory, self.values_path.lstrip("/"))
         name = utils.slugify(self.deck.title)
         chart = os.path.join(".", self.deck.dir_path)
-        parameters = utils.get_additional_render_parameters(self.deck, self.environment)
-        command = utils.get_command(output_dir, values, name, chart, *parameters, secrets=bool(self.deck.sops))
-        env = self._get_env()
-
-        # execute command
-        logger.debug(f"running: {command}, in dir {self.repository_directory}")
-        process = utils.execute(command, cwd=self.repository_directory, env=env)
+        parameters = utils.get_additional_render_parameters(self.deck, self.environment, override_values=False)
+        self.override_values_file = self._write_override_values()
+        command = utils.get_command(
+            output_dir,
+            values,
+            name,
+            chart,
+            *parameters,
+            secrets=bool(self.deck.sops),
+            override_values_file=self.override_values_file,
+        )
+        return command, self._get_env()
+
+    def _write_override_values(self) -> Optional[str]:
+        """Writes the override values of the environment into a values file, instead of passing a `--set` each."""
+        if not self.environment.override_values:
+            return None
+        fd, path = tempfile.mkstemp(prefix="override-values-", suffix=".yaml")
+        with os.fdopen(fd, "w") as f:
+            yaml.dump(utils.unflatten(self.environment.override_values), f, Dumper=utils.SafeDumper)
+        return path
+
+    def _cleanup(self):
+        if self.rendered_chart_dir is not None:
+            self.rendered_chart_dir.cleanup()
+        if self.override_values_file is not None:
+            try:
+                os.remove(self.override_values_file)
+            except FileNotFoundError:
+                pass
+            self.override_values_file = None
+
+    def _result(self, process: subprocess.CompletedProcess) -> str:
+        try:
+            self._output(process)
+        except HelmChartRenderError:
+            self._cleanup()
+            raise
+        return self.rendered_chart_dir.name
+
+    def _output(self, process: subprocess.CompletedProcess) -> str:
         logger.debug(f"helm 'template' process ended with: {process.returncode}")
-
         if process.returncode == 0:
-            return self.rendered_chart_dir.name
+            return process.stdout
 
-        raise HelmChartRenderError(process.stdout.read())
-
-    def __exit__(self, type, value, traceback):
-        self.rendered_chart_dir.cleanup()
+        raise HelmChartRenderError(process.stderr or process.stdout)
 
     def _get_env(self):
         """Create environment dictionary."""
-        env = os.environ.copy()
+        env = dict(utils.get_base_env())
         if self.deck.sops:
             if self.deck.sops.type == SopsProviderType.PGP:
-                self._prepare_gpg(self.deck.sops.get_env())
+                env.update(self._prepare_gpg(self.deck.sops.get_env()))
             elif self.deck.sops.type == SopsProviderType.AWS:
                 env.update(self.deck.sops.get_env())
 
@@ -70,6 +153,7 @@ class HelmCharts:
         env = {k: str(v) for k, v in env.items()}
         return env
 
-    def _prepare_gpg(self, sops_env: dict) -> None:
+    def _prepare_gpg(self, sops_env: dict) -> dict:
+        """Provides the private key to sops in a keyring of its own, see `commons.helm.gpg.KeyringCache`."""
         private_key = sops_env["PGP_PRIVATE_KEY"]
-        subprocess.call('echo "{key}" | gpg --fast-import'.format(key=private_key), shell=True)
+        return {"GNUPGHOME": KeyringCache().get(private_key)}
@@ -10,7 +10,9 @@ from typing import List
 import yaml
 from git import GitCommandError, Repo
 
+from commons.helm.conf import config
 from commons.helm.exceptions import RepositoryAuthenticationFailed, RepositoryBranchUnavailable, RepositoryCloningFailed
+from commons.helm.mirror import RepositoryCache
 
 
 @dataclass
@@ -29,19 +31,50 @@ class Repository:
     username: str = None
     token: str = None
     branch: str = None
+    use_cache: bool = None
+    commit: str = None
+    working_tree: bool = True
 
     @property
     def repo_url(self):
         return self.parse_url(self.url, username=self.username, token=self.token, branch=self.branch)
 
+    @property
+    def _use_cache(self) -> bool:
+        return config.REPOSITORY_CACHE_ENABLED if self.use_cache is None else self.use_cache
+
     def __enter__(self):
         logger = logging.getLogger("projects.helm")
-        self.temp_dir = tempfile.TemporaryDirectory()
-        logger.debug(f"start cloning repo to: {self.temp_dir} for {self.repo_url}")
+        use_cache = self._use_cache
         try:
-            return Repo.clone_from(self.repo_url, self.temp_dir.name, depth=1, branch=self.branch)
+            if use_cache:
+                logger.debug(f"checking out {self.url} from repository cache")
+                self._checkout = RepositoryCache().checkout(
+                    self.url, self.repo_url, self.branch, self.commit, self.working_tree
+                )
+                return self._checkout.__enter__()
+            self._checkout = None
+            self.temp_dir = tempfile.TemporaryDirectory()
+            logger.debug(f"start cloning repo to: {self.temp_dir} for {self.repo_url}")
+            # without a working tree only the git objects are fetched, see `commons.helm.tree.GitTreeReader`
+            repo = Repo.clone_from(
+                self.repo_url, self.temp_dir.name, depth=1, branch=self.branch, no_checkout=not self.working_tree
+            )
+            if self.commit and repo.head.commit.hexsha != self.commit:
+                logger.debug(f"checking out pinned commit {self.commit}")
+                repo.git.fetch("origin", self.commit, depth=1)
+                if self.working_tree:
+                    repo.git.checkout(self.commit)
+                else:
+                    repo.head.reset(self.commit, index=False, working_tree=False)
+            return repo
         except GitCommandError as e:
-            if f"fatal: Remote branch {self.branch} not found in upstream origin" in e.stderr:
+            if not use_cache:
+                self.temp_dir.cleanup()
+            if (
+                f"fatal: Remote branch {self.branch} not found in upstream origin" in e.stderr
+                or f"fatal: couldn't find remote ref refs/heads/{self.branch}" in e.stderr
+            ):
                 raise RepositoryBranchUnavailable
             elif "fatal: Authentication failed" in e.stderr:
                 raise RepositoryAuthenticationFailed
@@ -49,7 +82,21 @@ class Repository:
                 raise RepositoryCloningFailed
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.temp_dir.cleanup()
+        if self._checkout:
+            self._checkout.__exit__(exc_type, exc_val, exc_tb)
+        else:
+            self.temp_dir.cleanup()
+
+    def fetch_commit(self, repo: Repo, commit: str):
+        """Fetches `commit` into a checkout of this repository.
+
+        A worktree of the repository cache shares the objects of its mirror with other workers, hence the commit is
+        fetched into the mirror while holding its lock.
+        """
+        if self._use_cache:
+            RepositoryCache().fetch_commit(self.url, self.repo_url, commit)
+        else:
+            repo.git.fetch(self.repo_url, commit, depth=1, no_tags=True)
 
     @staticmethod
     def parse_url(url, username=None, token=None, branch="master"):
@@ -108,6 +155,9 @@ class SpecsData:
     source: str
     content: str
     kind: str
+    api_version: str = None
+    resource_name: str = None
+    namespace: str = None
 
 
 @dataclass
@@ -122,14 +172,16 @@ class RenderEnvironment:
         return self._override_values
 
     def set_value(self, key, value):
-        self._override_values[key] = value
+        """Sets a value like `helm --set key=value`, a string value is typed like helm does."""
+        from commons.helm import utils
+
+        self._override_values[key] = utils.typed_value(value)
 
     def update_values_from_yaml(self, file_content):
         from commons.helm import utils
 
-        result = utils.flatten(yaml.safe_load(file_content))
-        for k, v in result.items():
-            self.set_value(k, v)
+        # the values are typed by YAML already, e.g. a quoted '2' stays a string
+        self._override_values.update(utils.flatten(yaml.load(file_content, Loader=utils.SafeLoader) or {}))
 
 
 @dataclass
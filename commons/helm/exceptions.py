@@ -16,3 +16,24 @@ class HelmDependencyError(Exception):
 
 class HelmChartRenderError(Exception):
     pass
+
+
+class GPGKeyImportError(Exception):
+    pass
+
+
+class HelmChartRenderTimeout(HelmChartRenderError):
+    pass
+
+
+class HelmChartRenderErrors(Exception):
+    """Raised after a concurrent render if any environment failed.
+
+    `errors` holds a (deck, environment, exception) tuple for each failed environment, `result` the successfully
+    rendered (deck, environment) tuples in input order.
+    """
+
+    def __init__(self, errors, result):
+        super().__init__(f"{len(errors)} environment(s) could not be rendered")
+        self.errors = errors
+        self.result = result
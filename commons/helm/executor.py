@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from commons.helm import utils
+
+logger = logging.getLogger("projects.helm")
+
+
+@dataclass
+class RenderMetrics:
+    """Counters of a `RenderExecutor`, times are in seconds."""
+
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    queued: int = 0
+    running: int = 0
+    queue_time: float = 0.0
+    execution_time: float = 0.0
+    max_queue_time: float = 0.0
+    max_execution_time: float = 0.0
+
+    @property
+    def average_queue_time(self) -> float:
+        finished = self.completed + self.failed
+        return self.queue_time / finished if finished else 0.0
+
+    @property
+    def average_execution_time(self) -> float:
+        finished = self.completed + self.failed
+        return self.execution_time / finished if finished else 0.0
+
+
+class RenderExecutor:
+    """A bounded pool of render workers which is shared by all renders of a process, see `get_render_executor`.
+
+    All workers are started when the executor is created and initialized before their first render: the helm
+    version (part of the render cache key) and the base environment of helm processes are resolved up front instead
+    of on the first render. The time renders wait for a free worker and the time they take are recorded in `metrics`.
+    """
+
+    # seconds the workers wait for each other while starting up
+    start_timeout = 60
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="helm-render", initializer=self._initialize_worker
+        )
+        self._metrics = RenderMetrics()
+        self._lock = threading.Lock()
+        self._start_workers()
+
+    def _start_workers(self):
+        # the pool only starts a new thread if no worker is idle, hence every worker waits until all are started
+        barrier = threading.Barrier(self.max_workers)
+        for _ in range(self.max_workers):
+            self._executor.submit(self._wait_for_workers, barrier)
+
+    def _wait_for_workers(self, barrier: threading.Barrier):
+        try:
+            barrier.wait(self.start_timeout)
+        except threading.BrokenBarrierError:
+            logger.warning(f"not all of the {self.max_workers} render workers started")
+
+    @staticmethod
+    def _initialize_worker():
+        try:
+            utils.get_helm_version()
+        except OSError as e:
+            logger.warning(f"could not determine the helm version: {e}")
+        utils.get_base_env()
+
+    @property
+    def metrics(self) -> RenderMetrics:
+        """A snapshot of the metrics."""
+        with self._lock:
+            return replace(self._metrics)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            self._metrics.submitted += 1
+            self._metrics.queued += 1
+        try:
+            return self._executor.submit(self._run, time.monotonic(), fn, *args, **kwargs)
+        except RuntimeError:
+            # this executor was replaced by one of another size and shut down, see `get_render_executor`
+            with self._lock:
+                self._metrics.submitted -= 1
+                self._metrics.queued -= 1
+            return get_render_executor(self.max_workers).submit(fn, *args, **kwargs)
+
+    def _run(self, submitted_at: float, fn, *args, **kwargs):
+        started_at = time.monotonic()
+        queue_time = started_at - submitted_at
+        with self._lock:
+            self._metrics.queued -= 1
+            self._metrics.running += 1
+            self._metrics.queue_time += queue_time
+            self._metrics.max_queue_time = max(self._metrics.max_queue_time, queue_time)
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            execution_time = time.monotonic() - started_at
+            with self._lock:
+                self._metrics.running -= 1
+                if failed:
+                    self._metrics.failed += 1
+                else:
+                    self._metrics.completed += 1
+                self._metrics.execution_time += execution_time
+                self._metrics.max_execution_time = max(self._metrics.max_execution_time, execution_time)
+            logger.debug(f"render waited {queue_time:.3f}s for a worker and took {execution_time:.3f}s")
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_executor: Optional[RenderExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_render_executor(max_workers: int) -> RenderExecutor:
+    """The process-wide `RenderExecutor` with `max_workers` workers.
+
+    Only one executor is kept: if another number of workers is requested, a new executor replaces the current one,
+    which is shut down once its pending renders are done.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor.max_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = RenderExecutor(max_workers)
+        return _executor
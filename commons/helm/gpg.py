@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from commons.helm.conf import config
+from commons.helm.exceptions import GPGKeyImportError
+
+logger = logging.getLogger("projects.helm")
+
+GPG_TIMEOUT = 60  # seconds
+
+
+def _gpg(homedir: str, args: list, private_key: str = None) -> subprocess.CompletedProcess:
+    """Runs gpg in `homedir`, the key is passed via stdin."""
+    command = ["gpg", "--homedir", homedir, "--batch", "--no-tty", *args]
+    return subprocess.run(
+        command, input=private_key, encoding="utf-8", capture_output=True, timeout=GPG_TIMEOUT, check=False
+    )
+
+
+class KeyringCache:
+    """On-disk cache of isolated GnuPG home directories, each holding one imported private key.
+
+    A keyring is keyed by the fingerprint of its key and shared by all renders which use that key, set it as
+    `GNUPGHOME` for sops:
+    env["GNUPGHOME"] = KeyringCache().get(private_key)
+
+    Keys are only imported if there is no keyring for their fingerprint yet, the fingerprint of some key material is
+    looked up once per process. Whenever a key is imported, keyrings which were not used for `max_age` seconds are
+    evicted.
+    """
+
+    # sha256 of the key material -> fingerprint
+    _fingerprints = {}
+    _lock = threading.Lock()
+
+    def __init__(self, directory: str = None, max_age: int = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "gnupg")
+        self.max_age = max_age if max_age is not None else config.GPG_KEYRING_MAX_AGE
+
+    def keyring_path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, fingerprint)
+
+    def get(self, private_key: str) -> str:
+        """Returns the GnuPG home directory holding `private_key`."""
+        path = self.keyring_path(self.fingerprint(private_key))
+        try:
+            # the modification time is used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            self._import(private_key, path)
+            self.evict()
+        return path
+
+    def fingerprint(self, private_key: str) -> str:
+        digest = hashlib.sha256(private_key.encode("utf-8")).hexdigest()
+        fingerprint = self._fingerprints.get(digest)
+        if fingerprint is None:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.directory, prefix=".") as homedir:
+                process = _gpg(homedir, ["--with-colons", "--import-options", "show-only", "--import"], private_key)
+                fingerprint = self._parse_fingerprint(process.stdout)
+                self._kill_agent(homedir)
+            if process.returncode != 0 or not fingerprint:
+                raise GPGKeyImportError(f"could not read the fingerprint of the private key: {process.stderr}")
+            with self._lock:
+                self._fingerprints[digest] = fingerprint
+        return fingerprint
+
+    @staticmethod
+    def _parse_fingerprint(output: str) -> str:
+        # the first fingerprint is the one of the primary key
+        for line in output.splitlines():
+            fields = line.split(":")
+            if fields[0] == "fpr" and len(fields) > 9:
+                return fields[9]
+        return None
+
+    def _import(self, private_key: str, path: str) -> None:
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # import into a temporary directory first, so that concurrent renders never see partial keyrings
+        homedir = tempfile.mkdtemp(dir=self.directory, prefix=".")
+        try:
+            process = _gpg(homedir, ["--import"], private_key)
+            if process.returncode != 0:
+                raise GPGKeyImportError(f"could not import the private key: {process.stderr}")
+            self._kill_agent(homedir)
+            try:
+                os.rename(homedir, path)
+                logger.debug(f"imported private key into keyring {path}")
+            except OSError:
+                # another worker imported this key in the meantime
+                pass
+        finally:
+            shutil.rmtree(homedir, ignore_errors=True)
+
+    @staticmethod
+    def _kill_agent(homedir: str) -> None:
+        try:
+            subprocess.run(["gpgconf", "--homedir", homedir, "--kill", "gpg-agent"], capture_output=True, check=False)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """Removes keyrings (and leftover temporary directories) which were not used for `max_age` seconds."""
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                if not entry.is_dir() or now - entry.stat().st_mtime <= self.max_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            logger.debug(f"evicting keyring {entry.path}")
+            self._kill_agent(entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
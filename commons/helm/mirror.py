@@ -0,0 +1,169 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from git import GitCommandError, Repo
+
+from commons.helm.conf import config
+
+logger = logging.getLogger("projects.helm")
+
+
+@contextmanager
+def _flock(path, operation):
+    with open(path, "a") as f:
+        fcntl.flock(f, operation)
+        try:
+            yield f
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _directory_size(path) -> int:
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for fname in files:
+            try:
+                size += os.lstat(os.path.join(root, fname)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class RepositoryCache:
+    """On-disk cache of bare, shallow repository mirrors keyed by the repository url.
+
+    Every usage fetches the requested branch into the mirror (which is incremental after the first time) and checks
+    out a detached worktree from it:
+    with RepositoryCache().checkout(url, repo_url, branch) as repo:
+        ...
+
+    Each mirror is guarded by two lock files, so that multiple workers on one node can share it:
+    - `<key>.lock` is held exclusively while the mirror is modified (fetch, adding and removing worktrees)
+    - `<key>.use` is held shared as long as a worktree of the mirror exists, eviction requires it exclusively
+    """
+
+    def __init__(self, directory: str = None, max_size: int = None, max_age: int = None):
+        self.directory = directory or os.path.join(config.CACHE_DIR, "repositories")
+        self.max_size = max_size if max_size is not None else config.REPOSITORY_CACHE_MAX_SIZE
+        self.max_age = max_age if max_age is not None else config.REPOSITORY_CACHE_MAX_AGE
+
+    def key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def mirror_path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{self.key(url)}.git")
+
+    @contextmanager
+    def checkout(self, url: str, repo_url: str, branch: str = None, commit: str = None, working_tree: bool = True):
+        """Yields a `Repo` for a worktree of `commit`, or of `branch` (or the remote HEAD) if no commit is given.
+
+        `url` is used as cache key, `repo_url` (which may contain credentials) is only passed to `git fetch` and
+        never stored in the mirror. A pinned `commit` which is already in the mirror is checked out without fetching.
+        Without `working_tree` the worktree is added without checking out any files.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.mirror_path(url)
+        with _flock(f"{path[:-4]}.use", fcntl.LOCK_SH):
+            with _flock(f"{path[:-4]}.lock", fcntl.LOCK_EX):
+                if commit:
+                    mirror = self._fetch_commit(path, repo_url, commit)
+                    revision = commit
+                else:
+                    mirror = self._fetch(
+                        path, repo_url, f"refs/heads/{branch}" if branch else "HEAD", self._ref(branch)
+                    )
+                    revision = self._ref(branch)
+                temp_dir = tempfile.TemporaryDirectory()
+                working_dir = os.path.join(temp_dir.name, "worktree")
+                options = ["--detach"] if working_tree else ["--detach", "--no-checkout"]
+                mirror.git.worktree("add", *options, working_dir, revision)
+            try:
+                yield Repo(working_dir)
+            finally:
+                with _flock(f"{path[:-4]}.lock", fcntl.LOCK_EX):
+                    try:
+                        mirror.git.worktree("remove", "--force", working_dir)
+                    except GitCommandError:
+                        mirror.git.worktree("prune")
+                temp_dir.cleanup()
+        try:
+            self.evict()
+        except OSError as e:
+            logger.warning(f"could not evict repository cache in {self.directory}: {e}")
+
+    def fetch_commit(self, url: str, repo_url: str, commit: str) -> None:
+        """Fetches `commit` into the mirror of `url` unless it is there already, e.g. for a worktree of the mirror."""
+        path = self.mirror_path(url)
+        with _flock(f"{path[:-4]}.lock", fcntl.LOCK_EX):
+            self._fetch_commit(path, repo_url, commit)
+
+    def _ref(self, branch: str = None) -> str:
+        return f"refs/mirror/{branch or 'HEAD'}"
+
+    def _open(self, path: str) -> Repo:
+        if os.path.isdir(path):
+            return Repo(path)
+        logger.debug(f"created repository mirror {path}")
+        return Repo.init(path, bare=True)
+
+    def _fetch(self, path: str, repo_url: str, source: str, ref: str) -> Repo:
+        mirror = self._open(path)
+        logger.debug(f"fetching {source} into repository mirror {path}")
+        try:
+            mirror.git.fetch(repo_url, f"+{source}:{ref}", depth=1, no_tags=True)
+        except GitCommandError:
+            if not mirror.git.for_each_ref():
+                # never fetched successfully, don't keep the empty mirror around
+                shutil.rmtree(path, ignore_errors=True)
+            raise
+        # the modification time of the mirror is used for LRU eviction
+        os.utime(path)
+        return mirror
+
+    def _fetch_commit(self, path: str, repo_url: str, commit: str) -> Repo:
+        mirror = self._open(path)
+        try:
+            mirror.git.cat_file("-e", f"{commit}^{{commit}}")
+        except GitCommandError:
+            return self._fetch(path, repo_url, commit, f"refs/mirror/commits/{commit}")
+        os.utime(path)
+        return mirror
+
+    def evict(self) -> None:
+        """Removes mirrors which were not used for `max_age` seconds, then the least recently used ones until the
+        cache fits into `max_size` bytes. Mirrors which are currently checked out are never removed.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        mirrors = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".git") and os.path.isdir(path):
+                mirrors.append((os.stat(path).st_mtime, path, _directory_size(path)))
+        mirrors.sort()
+        total_size = sum(size for _, _, size in mirrors)
+        for last_used, path, size in mirrors:
+            if now - last_used <= self.max_age and total_size <= self.max_size:
+                break
+            if self._remove(path):
+                total_size -= size
+
+    def _remove(self, path: str) -> bool:
+        with open(f"{path[:-4]}.use", "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                logger.debug(f"evicting repository mirror {path}")
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return True
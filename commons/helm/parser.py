@@ -1,12 +1,23 @@
+import asyncio
 import logging
 import os
+import posixpath
 import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Tuple
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import yaml
+from git import GitCommandError, Repo
 from yaml import MarkedYAMLError
 
+from commons.helm.aio import AsyncHelmCharts
+from commons.helm.cache import RenderCache, get_render_cache
+from commons.helm.conf import config
 from commons.helm.context_manager import HelmCharts
 from commons.helm.data_classes import (
     DeckData,
@@ -16,57 +27,98 @@ from commons.helm.data_classes import (
     RepositoryData,
     SpecsData,
 )
+from commons.helm.exceptions import HelmChartRenderErrors
+from commons.helm.executor import get_render_executor
+from commons.helm.tree import GitTreeReader, TreeReader, WorkingTreeReader
 
 from . import utils
 
 logger = logging.getLogger("projects.helm")
 
+CHART_FILES = ("Chart.yaml", "chart.yaml")
+SOPS_KEY_RE = re.compile(rb"^sops:", re.MULTILINE)
+# any line starting at column 0 except comments and document markers ends the block of a top-level key
+TOP_LEVEL_LINE_RE = re.compile(rb"^[^\s#\-.]", re.MULTILINE)
+SOPS_CACHE_SIZE = 4096
+_sops_cache = OrderedDict()
+_sops_cache_lock = threading.Lock()
+
+
+def join_path(dir_path: str, name: str) -> str:
+    """Joins paths relative to the repository root, where the root may be given as "" or "."."""
+    return name if dir_path in ("", ".") else f"{dir_path}/{name}"
+
+
+def _decode(content: bytes) -> str:
+    """Decodes file content with universal newlines, like files opened in text mode."""
+    return content.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
 
 class ChartYamlParser:
-    def __init__(self, temporary_directory):
+    def __init__(self, temporary_directory, reader: TreeReader = None):
+        """`reader` provides the files of the repository, it defaults to the working tree in `temporary_directory`."""
         self.temporary_directory = temporary_directory
+        self.reader = reader or WorkingTreeReader(temporary_directory)
 
     def parse(self, dir_path, fname):
         return self._read_deck_data(fname, dir_path)
 
     def _read_deck_data(self, file_path, dir_path) -> DeckData:
-        """Retrieves deck information for a given Chart.yaml found in the temporary directory under `file_path`."""
-        if os.path.isfile(file_path):
-            with open(file_path) as fchart:
-                chart = yaml.load(fchart, Loader=yaml.SafeLoader)
-                service_name = chart.get("name", "<name not set>")
-                service_description = chart.get("description", "<description not set>")
-                service_type = chart.get("type", "")
-                return DeckData(
-                    title=service_name,
-                    type=service_type,
-                    description=service_description,
-                    dir_path=dir_path,
-                    file_information=self._retrieve_file_information(os.path.dirname(file_path)),
-                    environments=[],
-                )
+        """Retrieves deck information for a given Chart.yaml found in the repository under `file_path`.
+
+        `file_path` is either relative to the repository root or an absolute path in the temporary directory.
+        """
+        if os.path.isabs(file_path):
+            file_path = os.path.relpath(file_path, self.temporary_directory)
+        if self.reader.isfile(file_path):
+            chart = yaml.load(self.reader.read(file_path), Loader=utils.SafeLoader)
+            service_name = chart.get("name", "<name not set>")
+            service_description = chart.get("description", "<description not set>")
+            service_type = chart.get("type", "")
+            return DeckData(
+                title=service_name,
+                type=service_type,
+                description=service_description,
+                dir_path=dir_path,
+                file_information=self._retrieve_file_information(os.path.dirname(file_path)),
+                environments=[],
+            )
 
     def _retrieve_file_information(self, dir_path):
         """Retrieves the directory and file structure of deck.
 
         This is needed to display the files and directories in the frontend (for Helm value selection).
+        Files of a working tree are inspected by `HELM_PARSE_MAX_WORKERS` threads, the result keeps the order of the
+        directory walk. Objects of a git tree are read one at a time anyway, they are inspected in this thread.
         """
-        result = []
-        for tmp_dir_path, tmp_dirs, tmp_files in os.walk(dir_path):
+        entries = []
+        for tmp_dir_path, tmp_dirs, tmp_files in self.reader.walk(dir_path):
             # Directories may contain multiple files.
             # TODO handle directories with a more detailed approach ...
             # ... (parse files and provide general information for dir)
-            result.append(
-                FileInformation(
-                    path=tmp_dir_path[len(self.temporary_directory) :], encrypted=False, providers=[]
-                ).to_json()
-            )
+            entries.append((tmp_dir_path, None))
             tmp_yaml_files = filter(lambda x: x.endswith("yaml"), tmp_files)
             for tmp_file in tmp_yaml_files:
-                file_information = self._get_file_information(tmp_dir_path, tmp_file)
-                result.append(file_information.to_json())
+                entries.append((tmp_dir_path, tmp_file))
+
+        def file_information(entry):
+            tmp_dir_path, tmp_file = entry
+            if tmp_file is None:
+                return FileInformation(path=self._short_path(tmp_dir_path), encrypted=False, providers=[]).to_json()
+            return self._get_file_information(tmp_dir_path, tmp_file).to_json()
+
+        if config.PARSE_MAX_WORKERS > 1 and len(entries) > 2 and isinstance(self.reader, WorkingTreeReader):
+            with ThreadPoolExecutor(max_workers=config.PARSE_MAX_WORKERS) as executor:
+                result = list(executor.map(file_information, entries))
+        else:
+            result = [file_information(entry) for entry in entries]
         return {"information": result}
 
+    @staticmethod
+    def _short_path(dir_path):
+        """Path of a directory as displayed in the frontend, relative to the repository root."""
+        return f"/{dir_path}" if dir_path else ""
+
     def _get_file_information(self, file_path, file_name) -> FileInformation:
         """Retrieves basic information about a file.
 
@@ -74,77 +126,310 @@ class ChartYamlParser:
 
         We assume that any given `file_path` + `file_name` is a path to a YAML file. Checks whether a file is
         encrypted or not. If it is encrypted the type of provider is stored on the FileInformation object.
+        The result is cached by the git blob SHA of the file, so unchanged files are only inspected once.
         """
-
-        with open(os.path.join(file_path, file_name), "r") as file:
-            short_path = os.path.join(file_path[len(self.temporary_directory) :], file_name)
-            try:
-                yaml_file = yaml.load(file, Loader=yaml.SafeLoader)
-            except MarkedYAMLError:
-                return FileInformation(path=short_path, encrypted=False, providers=[])
-            if type(yaml_file) is dict:
-                sops = yaml_file.get("sops", False)
-                encrypted = bool(sops)
-                providers = []
-                if encrypted:
-                    for provider in ["kms", "gcp_kms", "pgp"]:
-                        if bool(sops.get(provider)):
-                            providers.append(provider)
-                return FileInformation(path=short_path, providers=providers, encrypted=encrypted)
+        path = join_path(file_path, file_name)
+        short_path = os.path.join(self._short_path(file_path), file_name)
+        providers = self.get_sops_providers(*self.reader.blob(path))
+        if providers is None:
             return FileInformation(path=short_path, providers=[], encrypted=False)
+        return FileInformation(path=short_path, providers=providers, encrypted=True)
+
+    @classmethod
+    def get_sops_providers(cls, blob_sha: str, content: Union[bytes, Callable[[], bytes]]) -> Optional[List[str]]:
+        """Returns the providers of a sops encrypted YAML file or `None` if the file is not encrypted.
+
+        `content` may be a callable, it is only read if the blob is not cached yet.
+        """
+        with _sops_cache_lock:
+            if blob_sha in _sops_cache:
+                _sops_cache.move_to_end(blob_sha)
+                return _sops_cache[blob_sha]
+        if callable(content):
+            content = content()
+        providers = cls._read_sops_providers(content)
+        with _sops_cache_lock:
+            _sops_cache[blob_sha] = providers
+            if len(_sops_cache) > SOPS_CACHE_SIZE:
+                _sops_cache.popitem(last=False)
+        return providers
+
+    @staticmethod
+    def _read_sops_providers(content: bytes) -> Optional[List[str]]:
+        # sops stores its metadata in a top-level `sops` key, only this block is loaded
+        match = SOPS_KEY_RE.search(content)
+        if not match:
+            return None
+        end = TOP_LEVEL_LINE_RE.search(content, match.end())
+        block = content[match.start() : end.start() if end else len(content)]
+        try:
+            sops = (yaml.load(block, Loader=utils.SafeLoader) or {}).get("sops")
+        except (MarkedYAMLError, AttributeError):
+            return None
+        if not sops or not isinstance(sops, dict):
+            return None
+        return [provider for provider in ["kms", "gcp_kms", "pgp"] if bool(sops.get(provider))]
 
 
 class SpecsParser:
+    # a document starts with a `---` marker at the beginning of a line (followed by whitespace, a comment or content)
+    # and may be terminated by a `...` marker, both must not appear at column 0 inside of any YAML content. Markers
+    # are searched with their preceding newline, which is much faster than `^` in multiline mode.
+    document_marker_re = re.compile(r"\n(?:---(?=\s|$)|\.\.\.[ \t]*(?=\n|$))")
+    leading_document_marker_re = re.compile(r"---(?=\s|$)|\.\.\.[ \t]*(?=\n|$)")
+    chunk_size = 64 * 1024
+
     @classmethod
-    def read_specs(cls, path):
-        """Parse given file for specs.
+    def split_documents(cls, chunks: Iterable[str]) -> Iterator[str]:
+        """Splits a stream of YAML text (lines or chunks of any size) into its documents without loading them.
 
-        :returns List[SpecsData]
+        Every yielded document starts with the remainder of the line of its `---` marker.
         """
-        with open(path, "r") as f:
-            specs = []
-            # logger.debug(f"reading file: {filename}")
-            content = f.read()
-            # one file can consist of multiple specs
-            for spec in content.split("---"):
-                # check if this is rather empty
-                if not spec.strip():
+        pending = []
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            # only complete lines are searched, a marker may be split across chunks
+            end = buffer.rfind("\n") + 1
+            if end:
+                region, buffer = buffer[:end], buffer[end:]
+                yield from cls._split_region(region, pending)
+        yield from cls._split_region(buffer, pending)
+        document = "".join(pending)
+        if document:
+            yield document
+
+    @classmethod
+    def _split_region(cls, region: str, pending: list) -> Iterator[str]:
+        """Yields the documents completed within `region`, `pending` holds the parts of the current document.
+
+        `region` consists of complete lines.
+        """
+        position = 0
+        match = cls.leading_document_marker_re.match(region)
+        if match:
+            document = "".join(pending)
+            if document:
+                yield document
+            pending.clear()
+            position = 3 if region[0] == "-" else match.end()
+        for match in cls.document_marker_re.finditer(region, position):
+            start = match.start() + 1
+            if pending:
+                pending.append(region[position:start])
+                document = "".join(pending)
+                pending.clear()
+            else:
+                document = region[position:start]
+            if document:
+                yield document
+            position = start + 3 if region[start] == "-" else match.end()
+        pending.append(region[position:])
+
+    @staticmethod
+    def _scalar(value: Optional[str]) -> Optional[str]:
+        value = value.strip() if value else None
+        if not value:
+            return None
+        if value[0] in "\"'":
+            end = value.find(value[0], 1)
+            return value[1:end] if end > 0 else value[1:]
+        return value.split(" #", 1)[0].rstrip() if " #" in value else value
+
+    @staticmethod
+    def _load_metadata(spec: str) -> Tuple[Optional[str], Optional[str]]:
+        """Reads `name` and `namespace` of a `metadata` value which isn't a plain block, e.g. a flow mapping."""
+        try:
+            data = yaml.load(spec, Loader=utils.SafeLoader)
+        except yaml.YAMLError:
+            return None, None
+        metadata = data.get("metadata") if isinstance(data, dict) else None
+        if not isinstance(metadata, dict):
+            return None, None
+        resource_name, namespace = metadata.get("name"), metadata.get("namespace")
+        return (
+            str(resource_name) if resource_name is not None else None,
+            str(namespace) if namespace is not None else None,
+        )
+
+    @classmethod
+    def _read_header(cls, spec: str) -> Tuple[Optional[str], ...]:
+        """Returns source, kind, apiVersion, metadata.name and metadata.namespace of a document.
+
+        The lines are scanned until `apiVersion`, `kind` and the block of `metadata` were read, the blocks of other
+        top-level keys are passed over.
+        """
+        source = kind = api_version = resource_name = namespace = None
+        metadata = inline_metadata = False
+        # within the block of `metadata` the indentation of its children ("" before the first one), otherwise None
+        indent = None
+        lines = spec.split("\n")
+        # the document starts with the remainder of the line of its marker, or with its first line
+        if spec[:1] in " \t\n":
+            del lines[0]
+        for line in lines:
+            if indent is not None:
+                content = line.lstrip(" \t")
+                if not content or content[0] == "#":
                     continue
-                # we parse the file in order to extract the required information
-                kind_re = r"kind:\s*\w+"
-                source_re = r"Source:\s*[\w/\-\.]*"
-                kindmatch = re.search(kind_re, spec)
-                if kindmatch:
-                    kind = kindmatch.group().split(":")[-1].strip()
-                else:
-                    kind = None
-                sourcematch = re.search(source_re, spec)
-                if sourcematch:
-                    source = sourcematch.group().split(":")[-1].strip()
+                if not indent:
+                    indent = line[: len(line) - len(content)]
+                if indent and line.startswith(indent):
+                    # only the lines at the indentation of the first child are direct children (unlike `labels.name`)
+                    if len(line) - len(content) == len(indent):
+                        if content.startswith("name:"):
+                            resource_name = content[5:]
+                        elif content.startswith("namespace:"):
+                            namespace = content[10:]
+                        else:
+                            continue
+                        if (
+                            resource_name is not None
+                            and namespace is not None
+                            and kind is not None
+                            and api_version is not None
+                        ):
+                            break
+                    continue
+                indent = None
+                if kind is not None and api_version is not None:
+                    break
+            if line.startswith("kind:"):
+                kind = line[5:]
+            elif line.startswith("apiVersion:"):
+                api_version = line[11:]
+            elif line.startswith("metadata:"):
+                metadata = True
+                value = line[9:].lstrip(" \t")
+                if value and value[0] != "#":
+                    # e.g. a flow mapping or an anchor, which is left to the YAML parser
+                    inline_metadata = True
                 else:
-                    # we take the source from the last
-                    pass
-                specs.append(
-                    SpecsData(
-                        name=os.path.basename(path),
-                        source=source,
-                        content=spec,
-                        kind=kind,
-                    )
-                )
+                    indent = ""
+                continue
+            elif line.startswith("#"):
+                comment = line[1:].lstrip(" \t")
+                if source is None and comment.startswith("Source:"):
+                    source = (comment[7:].split() or [None])[0]
+                continue
+            else:
+                continue
+            if kind is not None and api_version is not None and metadata and indent is None:
+                break
+        if inline_metadata:
+            resource_name, namespace = cls._load_metadata(spec)
+        else:
+            resource_name, namespace = cls._scalar(resource_name), cls._scalar(namespace)
+        return source, cls._scalar(kind), cls._scalar(api_version), resource_name, namespace
 
-        return specs
+    @classmethod
+    def extract_metadata(cls, spec: str) -> dict:
+        """Extracts source, kind, apiVersion, metadata.name and metadata.namespace of a document.
+
+        Only the header of the document is read, unless one of the keys comes after another top-level key. Values
+        are read from plain or quoted scalars, the YAML is only loaded if `metadata` has a value on its own line
+        (e.g. a flow mapping).
+        """
+        return dict(zip(("source", "kind", "api_version", "resource_name", "namespace"), cls._read_header(spec)))
+
+    @classmethod
+    def iter_specs(cls, path) -> Iterator[SpecsData]:
+        """Parse given file for specs, one document at a time.
+
+        :returns Iterator[SpecsData]
+        """
+        with open(path, "r") as f:
+            # one file can consist of multiple specs
+            yield from cls.iter_stream_specs(iter(partial(f.read, cls.chunk_size), ""), os.path.basename(path))
+
+    @classmethod
+    def iter_stream_specs(cls, chunks: Iterable[str], name: str = None) -> Iterator[SpecsData]:
+        """Parse a stream of YAML text for specs, e.g. the output of `helm template` without `--output-dir`.
+
+        Without a `name` each spec is named after the file in its `# Source:` comment, like the files helm writes.
+
+        :returns Iterator[SpecsData]
+        """
+        for spec in cls.split_documents(chunks):
+            # check if this is rather empty
+            if not spec or spec.isspace():
+                continue
+            source, kind, api_version, resource_name, namespace = cls._read_header(spec)
+            yield SpecsData(
+                name=name or posixpath.basename(source or ""),
+                source=source,
+                content=spec,
+                kind=kind,
+                api_version=api_version,
+                resource_name=resource_name,
+                namespace=namespace,
+            )
+
+    @classmethod
+    def read_stream_specs(cls, text: str) -> List[SpecsData]:
+        return list(cls.iter_stream_specs([text]))
+
+    @classmethod
+    def read_specs(cls, path):
+        """Parse given file for specs.
+
+        :returns List[SpecsData]
+        """
+        return list(cls.iter_specs(path))
 
 
 class HelmRepositoryParser:
-    def __init__(self, repository_url, access_username=None, access_token=None, branch="master"):
-        """Initializes the parser for a given repository."""
+    """Parses and renders the decks of a helm chart repository.
+
+    Every call to `parse`, `render` and `get_specs` clones the repository on its own. To serve several calls from
+    a single checkout, the parser can be used as a context manager:
+    with HelmRepositoryParser(repository_url, commit=commit) as parser:
+        parser.parse()
+        parser.render((deck, environment), ...)
+        parser.get_specs(deck_hash, environment)
+    """
+
+    def __init__(
+        self,
+        repository_url,
+        access_username=None,
+        access_token=None,
+        branch="master",
+        use_cache=None,
+        commit=None,
+        render_cache: RenderCache = None,
+    ):
+        """Initializes the parser for a given repository.
+
+        `use_cache` toggles the on-disk repository mirror cache, it defaults to `HELM_REPOSITORY_CACHE_ENABLED`.
+        `commit` pins the checkout to a commit of `branch` instead of its head.
+        `render_cache` stores rendered specs by their inputs, it defaults to the one configured in `HELM_RENDER_CACHE`.
+        """
         self.url = repository_url
         self.username = access_username
         self.token = access_token
         self.branch = branch
+        self.use_cache = use_cache
+        self.commit = commit
+        self.render_cache = render_cache if render_cache is not None else get_render_cache()
         self._repository_data: RepositoryData = None
         self._deck_data: List[DeckData] = []
+        self._repository: Repository = None
+        self._repo: Repo = None
+        self._parsed_repo: Repo = None
+
+    def __enter__(self):
+        self._repository = Repository(self.url, self.username, self.token, self.branch, self.use_cache, self.commit)
+        self._repo = self._repository.__enter__()
+        self._set_repository_data(self._repo)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._repository.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self._repository = None
+            self._repo = None
 
     @property
     def repository_data(self):
@@ -160,73 +445,305 @@ class HelmRepositoryParser:
     def get_deck_data(self):
         return self.deck_data
 
-    def parse(self):
-        """Clones repository and parses repository meta information as well as deck information."""
-        with Repository(self.url, self.username, self.token, self.branch) as repo:
-            self._repository_data = RepositoryData(
-                current_commit=repo.head.commit,
-                current_commit_date_time=datetime.fromtimestamp(repo.head.commit.committed_date),
-            )
-            self.parse_deck_data(repo.working_dir)
+    @contextmanager
+    def _checkout(self, working_tree: bool = True) -> Repo:
+        """Yields the open checkout of the current session or clones the repository for a single operation.
 
-    def render(self, *args: Tuple[DeckData, RenderEnvironment]):
-        result = []
-        with Repository(self.url, self.username, self.token, self.branch) as repo:
-            self._repository_data = RepositoryData(
-                current_commit=repo.head.commit,
-                current_commit_date_time=datetime.fromtimestamp(repo.head.commit.committed_date),
+        Without `working_tree` the clone only contains the git objects, see `_tree_reader`.
+        """
+        if self._repo is not None:
+            yield self._repo
+        else:
+            repository = Repository(
+                self.url, self.username, self.token, self.branch, self.use_cache, self.commit, working_tree
             )
+            with repository as repo:
+                self._set_repository_data(repo)
+                yield repo
+
+    def _tree_reader(self, repo: Repo) -> TreeReader:
+        """Files of a checkout: from disk in a session, otherwise straight from the git objects."""
+        if repo is self._repo:
+            return WorkingTreeReader(repo.working_dir)
+        return GitTreeReader(repo.head.commit.tree)
+
+    def _set_repository_data(self, repo: Repo):
+        self._repository_data = RepositoryData(
+            current_commit=repo.head.commit,
+            current_commit_date_time=datetime.fromtimestamp(repo.head.commit.committed_date),
+        )
+
+    def _is_parsed(self, repo: Repo) -> bool:
+        """Whether `deck_data` was parsed from the checkout of the current session."""
+        return repo is self._repo and self._parsed_repo is repo
+
+    def parse(self, previous_commit: str = None, previous_deck_data: List[DeckData] = None):
+        """Clones repository and parses repository meta information as well as deck information.
+
+        If the decks of a `previous_commit` are given, only decks whose directories changed since are parsed again,
+        the others are reused (see `parse_deck_data_incrementally`).
+        Outside of a session no working tree is checked out, the files are read from the git objects.
+        """
+        with self._checkout(working_tree=False) as repo:
+            if not self._is_parsed(repo):
+                self._deck_data = []
+                reader = self._tree_reader(repo)
+                if previous_commit and previous_deck_data is not None:
+                    if not self.parse_deck_data_incrementally(repo, previous_commit, previous_deck_data, reader):
+                        self.parse_deck_data(repo.working_dir, reader)
+                else:
+                    self.parse_deck_data(repo.working_dir, reader)
+                self._parsed_repo = repo
+
+    def render(self, *args: Tuple[DeckData, RenderEnvironment], max_workers: int = None):
+        """Renders the given (deck, environment) pairs.
+
+        With `max_workers` > 1 (defaults to `HELM_RENDER_MAX_WORKERS`) the pairs are rendered concurrently by the
+        process-wide `RenderExecutor` of that size. The result keeps the input order and a failing environment does not
+        abort the others: all errors are raised together as `HelmChartRenderErrors` once every render finished.
+        """
+        max_workers = config.RENDER_MAX_WORKERS if max_workers is None else max_workers
+        with self._checkout() as repo:
             if not self.deck_data:
                 self.parse_deck_data(repo.working_dir)
-            for deck, environment in args:
-                specs = self.read_specs_data(repo.working_dir, deck, environment)
-                environment.specs_data = specs
-                environment.values_yaml = self.get_values_yaml(repo.working_dir, environment)
-                result.append((deck, environment))
+                self._parsed_repo = repo
+            if max_workers > 1 and len(args) > 1:
+                return self._render_concurrently(repo.working_dir, args, max_workers)
+            return [self._render_environment(repo.working_dir, deck, environment) for deck, environment in args]
+
+    async def arender(
+        self, *args: Tuple[DeckData, RenderEnvironment], timeout: float = None, max_concurrency: int = None
+    ):
+        """Asyncio counterpart of `render`, many renders can be multiplexed on one event loop.
+
+        Up to `max_concurrency` (defaults to `HELM_RENDER_MAX_CONCURRENCY`) `helm template` processes run at the same
+        time, each one is killed after `timeout` seconds (defaults to `HELM_RENDER_TIMEOUT`, 0 disables it). Cloning,
+        parsing and reading the rendered specs run in the default executor. Like a concurrent `render`, the result keeps
+        the input order and errors are raised together as `HelmChartRenderErrors`. Cancelling the awaiting task kills
+        all running renders.
+        """
+        timeout = (config.RENDER_TIMEOUT or None) if timeout is None else timeout
+        semaphore = asyncio.Semaphore(config.RENDER_MAX_CONCURRENCY if max_concurrency is None else max_concurrency)
+        loop = asyncio.get_running_loop()
+        checkout = self._checkout()
+        repo = await loop.run_in_executor(None, checkout.__enter__)
+        try:
+            if not self.deck_data:
+                await loop.run_in_executor(None, self.parse_deck_data, repo.working_dir)
+                self._parsed_repo = repo
+
+            async def render_environment(deck, environment):
+                async with semaphore:
+                    return await self._arender_environment(repo.working_dir, deck, environment, timeout)
+
+            results = await asyncio.gather(
+                *(render_environment(deck, environment) for deck, environment in args), return_exceptions=True
+            )
+        finally:
+            await loop.run_in_executor(None, checkout.__exit__, None, None, None)
+        return self._collect_results(args, results)
+
+    async def _arender_environment(
+        self, temp_dir: str, deck: DeckData, environment: RenderEnvironment, timeout: float = None
+    ):
+        loop = asyncio.get_running_loop()
+        # the cache key runs `helm version` and the cache may do I/O, neither must block the event loop
+        cache_key = await loop.run_in_executor(None, self._render_cache_key, temp_dir, deck, environment)
+        specs_data = await loop.run_in_executor(None, self.render_cache.get, cache_key) if cache_key else None
+        if specs_data is None:
+            charts = AsyncHelmCharts(repository_directory=temp_dir, deck=deck, environment=environment, timeout=timeout)
+            if config.RENDER_TO_STDOUT:
+                output = await charts.render()
+                specs_data = await loop.run_in_executor(None, SpecsParser.read_stream_specs, output)
+            else:
+                async with charts as kube_files_dir:
+                    specs_data = await loop.run_in_executor(None, self.read_rendered_specs, kube_files_dir)
+            if cache_key:
+                await loop.run_in_executor(None, self.render_cache.set, cache_key, specs_data)
+        environment.specs_data = specs_data
+        environment.values_yaml = await loop.run_in_executor(None, self.get_values_yaml, temp_dir, environment)
+        return deck, environment
+
+    def _render_environment(self, temp_dir: str, deck: DeckData, environment: RenderEnvironment):
+        environment.specs_data = self.read_specs_data(temp_dir, deck, environment)
+        environment.values_yaml = self.get_values_yaml(temp_dir, environment)
+        return deck, environment
+
+    def _render_concurrently(self, temp_dir: str, args: Tuple[Tuple[DeckData, RenderEnvironment]], max_workers: int):
+        executor = get_render_executor(max_workers)
+        futures = [executor.submit(self._render_environment, temp_dir, deck, environment) for deck, environment in args]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return self._collect_results(args, results)
+
+    @staticmethod
+    def _collect_results(args: Tuple[Tuple[DeckData, RenderEnvironment]], results: list):
+        """Raises `HelmChartRenderErrors` if any of the `results` (in the order of `args`) is an exception."""
+        result = []
+        errors = []
+        for (deck, environment), outcome in zip(args, results):
+            if isinstance(outcome, BaseException):
+                logger.error(f"rendering {deck.title} with {environment.values_path} failed: {outcome}")
+                errors.append((deck, environment, outcome))
+            else:
+                result.append(outcome)
+        if errors:
+            raise HelmChartRenderErrors(errors, result)
         return result
 
-    def get_values_yaml(self, temp_dir: str, environment: RenderEnvironment) -> str:
+    def get_values_yaml(self, temp_dir: str, environment: RenderEnvironment, reader: TreeReader = None) -> str:
+        reader = reader or WorkingTreeReader(temp_dir)
         values_yaml = ""
         if environment.values_path:
-            path = os.path.join(temp_dir, environment.values_path.lstrip("/"))
-            if os.path.isfile(path):
-                with open(path, "r") as f:
-                    return f.read()
-            elif os.path.isdir(path):
+            path = environment.values_path.strip("/")
+            if reader.isfile(path):
+                return _decode(reader.read(path))
+            elif reader.isdir(path):
                 file_contents = []
-                for file in os.listdir(path):
+                for file in reader.listdir(path):
                     if file.endswith(".yml") or file.endswith(".yaml"):
-                        with open(os.path.join(path, file)) as f:
-                            file_contents.append(f.read())
+                        file_contents.append(_decode(reader.read(join_path(path, file))))
                 return utils.merge_multiple_yaml_files(*file_contents)
         return values_yaml
 
+    def iter_specs_data(self, temp_dir: str, deck: DeckData, environment: RenderEnvironment) -> Iterator[SpecsData]:
+        """Renders a deck and yields its specs one document at a time.
+
+        The output of helm is parsed in memory, unless `HELM_RENDER_TO_STDOUT` is disabled: then helm renders into a
+        temporary directory which is removed as soon as the generator is exhausted or closed.
+        """
+        charts = HelmCharts(repository_directory=temp_dir, deck=deck, environment=environment)
+        if config.RENDER_TO_STDOUT:
+            yield from SpecsParser.iter_stream_specs([charts.render()])
+            return
+        with charts as kube_files_dir:
+            yield from self.iter_rendered_specs(kube_files_dir)
+
+    @staticmethod
+    def iter_rendered_specs(kube_files_dir: str) -> Iterator[SpecsData]:
+        for root, dirs, files in os.walk(kube_files_dir):
+            for fname in filter(lambda fname: fname.endswith(".yaml"), files):
+                yield from SpecsParser.iter_specs(os.path.join(root, fname))
+
+    @classmethod
+    def read_rendered_specs(cls, kube_files_dir: str) -> List[SpecsData]:
+        return list(cls.iter_rendered_specs(kube_files_dir))
+
+    def _render_cache_key(self, temp_dir: str, deck: DeckData, environment: RenderEnvironment) -> Optional[str]:
+        if self.render_cache is None or not self.repository_data:
+            return None
+        charts = HelmCharts(repository_directory=temp_dir, deck=deck, environment=environment)
+        return charts.cache_key(self.repository_data.current_commit.hexsha)
+
     def read_specs_data(self, temp_dir: str, deck: DeckData, environment: RenderEnvironment):
-        result = []
-        with HelmCharts(repository_directory=temp_dir, deck=deck, environment=environment) as kube_files_dir:
-            for root, dirs, files in os.walk(kube_files_dir):
-                for fname in filter(lambda fname: fname.endswith(".yaml"), files):
-                    specs = SpecsParser.read_specs(os.path.join(root, fname))
-                    result.extend(specs)
+        cache_key = self._render_cache_key(temp_dir, deck, environment)
+        if cache_key:
+            cached = self.render_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"render cache hit for {deck.title} with {environment.values_path}")
+                return cached
+
+        result = list(self.iter_specs_data(temp_dir, deck, environment))
+        if cache_key:
+            self.render_cache.set(cache_key, result)
         return result
 
-    def parse_deck_data(self, temp_dir):
-        """Iterates through repository structure and triggers Chart.yaml file parsing."""
-        for dir_path, dirs, files in os.walk(temp_dir):
-            chart_files = list(filter(lambda x: x == "Chart.yaml" or x == "chart.yaml", files))
+    def parse_deck_data(self, temp_dir, reader: TreeReader = None):
+        """Iterates through repository structure and triggers Chart.yaml file parsing.
+
+        `reader` provides the files of the repository, it defaults to the working tree in `temp_dir`.
+        """
+        reader = reader or WorkingTreeReader(temp_dir)
+        for dir_path, dirs, files in reader.walk():
+            chart_files = list(filter(lambda x: x in CHART_FILES, files))
             if chart_files:
-                f_path = os.path.join(dir_path, chart_files[0])
-                deck_data = ChartYamlParser(temp_dir).parse(os.path.relpath(dir_path, temp_dir), f_path)
+                f_path = join_path(dir_path, chart_files[0])
+                deck_data = ChartYamlParser(temp_dir, reader).parse(dir_path or ".", f_path)
                 self.deck_data.append(deck_data)
                 dirs[:] = []  # don't look for any yaml files in sub directories
 
-    def get_specs(self, deck_hash, environment, sops=None):
-        with Repository(self.url, self.username, self.token, self.branch) as repo:
-            self._repository_data = RepositoryData(
-                current_commit=repo.head.commit,
-                current_commit_date_time=datetime.fromtimestamp(repo.head.commit.committed_date),
+    def parse_deck_data_incrementally(
+        self, repo: Repo, previous_commit: str, previous_deck_data: List[DeckData], reader: TreeReader = None
+    ):
+        """Parses only the decks whose directories changed between `previous_commit` and the checkout.
+
+        Unchanged decks of `previous_deck_data` are reused as they are, changed ones are parsed again and charts
+        added outside of existing decks are discovered from the diff. Returns False without touching `deck_data` if
+        the diff cannot be computed or a deck's chart was removed; a full parse is required then.
+        """
+        temp_dir = repo.working_dir
+        reader = reader or WorkingTreeReader(temp_dir)
+        try:
+            changed_paths = self._changed_paths(repo, previous_commit)
+        except GitCommandError as e:
+            logger.info(f"could not diff against {previous_commit}, parsing all decks: {e}")
+            return False
+
+        def chart_file(dir_path):
+            for fname in CHART_FILES:
+                if reader.isfile(join_path(dir_path, fname)):
+                    return join_path(dir_path, fname)
+            return None
+
+        def in_directory(path, dir_path):
+            return dir_path == "." or path.startswith(dir_path + "/")
+
+        deck_data = []
+        for deck in previous_deck_data:
+            if not any(in_directory(path, deck.dir_path) for path in changed_paths):
+                deck_data.append(deck)
+                continue
+            f_path = chart_file(deck.dir_path)
+            if f_path is None:
+                # charts nested in the removed deck may be decks on their own now
+                return False
+            logger.debug(f"deck in {deck.dir_path} changed since {previous_commit}")
+            deck_data.append(ChartYamlParser(temp_dir, reader).parse(deck.dir_path, f_path))
+
+        # charts added outside of existing decks, a chart is only a deck if no parent directory is one
+        known_dirs = [deck.dir_path for deck in deck_data]
+        for path in sorted(changed_paths):
+            if os.path.basename(path) not in CHART_FILES:
+                continue
+            dir_path = os.path.dirname(path) or "."
+            if any(in_directory(path, known_dir) for known_dir in known_dirs) or not chart_file(dir_path):
+                continue
+            parent = os.path.dirname(dir_path)
+            while parent and not chart_file(parent):
+                parent = os.path.dirname(parent)
+            if parent or (dir_path != "." and chart_file(".")):
+                continue
+            if any(in_directory(known_dir, dir_path) for known_dir in known_dirs):
+                # existing decks are nested in the new chart now
+                return False
+            logger.debug(f"deck in {dir_path} was added since {previous_commit}")
+            deck_data.append(ChartYamlParser(temp_dir, reader).parse(dir_path, chart_file(dir_path)))
+            known_dirs.append(dir_path)
+
+        self.deck_data.extend(deck_data)
+        return True
+
+    def _changed_paths(self, repo: Repo, previous_commit: str) -> Set[str]:
+        """Paths changed between `previous_commit` and the checkout, the commit is fetched if it is not available."""
+        try:
+            repo.git.cat_file("-e", f"{previous_commit}^{{commit}}")
+        except GitCommandError:
+            Repository(self.url, self.username, self.token, use_cache=self.use_cache).fetch_commit(
+                repo, previous_commit
             )
-            self.parse_deck_data(repo.working_dir)
+        output = repo.git.diff("--name-only", "--no-renames", previous_commit, repo.head.commit.hexsha)
+        return set(filter(None, output.splitlines()))
+
+    def get_specs(self, deck_hash, environment, sops=None):
+        with self._checkout() as repo:
+            if not self._is_parsed(repo):
+                self._deck_data = []
+                self.parse_deck_data(repo.working_dir)
+                self._parsed_repo = repo
             deck = next(filter(lambda x: deck_hash == x.hash, self.deck_data))
             if sops:
                 deck.sops = sops
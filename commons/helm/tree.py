@@ -0,0 +1,132 @@
+import os
+import threading
+from functools import partial
+from typing import Callable, Iterator, List, Tuple, Union
+
+from git import Tree
+
+from commons.helm import utils
+
+
+class TreeReader:
+    """Read-only access to the files of a repository revision.
+
+    Paths are relative to the repository root and use "/" as separator, the root itself is "".
+    """
+
+    def walk(self, top: str = "") -> Iterator[Tuple[str, List[str], List[str]]]:
+        """Like `os.walk` (top-down), directories can be pruned by modifying the yielded list in place."""
+        raise NotImplementedError
+
+    def isfile(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def isdir(self, path: str) -> bool:
+        raise NotImplementedError
+
+    def listdir(self, path: str) -> List[str]:
+        raise NotImplementedError
+
+    def read(self, path: str) -> bytes:
+        raise NotImplementedError
+
+    def blob_sha(self, path: str) -> str:
+        return utils.git_blob_sha(self.read(path))
+
+    def blob(self, path: str) -> Tuple[str, Union[bytes, Callable[[], bytes]]]:
+        """Returns the blob SHA of a file along with its content, the content is a callable reading the file if the
+        SHA is known without reading it.
+        """
+        content = self.read(path)
+        return utils.git_blob_sha(content), content
+
+
+class WorkingTreeReader(TreeReader):
+    """Reads files of a checked out working tree from disk."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, path: str) -> str:
+        return os.path.join(self.root, path) if path else self.root
+
+    def walk(self, top: str = "") -> Iterator[Tuple[str, List[str], List[str]]]:
+        root_length = len(self.root) + 1
+        for dir_path, dirs, files in os.walk(self._path(top)):
+            if ".git" in dirs:
+                dirs.remove(".git")
+            yield dir_path[root_length:], dirs, files
+
+    def isfile(self, path: str) -> bool:
+        return os.path.isfile(self._path(path))
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(self._path(path))
+
+    def listdir(self, path: str) -> List[str]:
+        return os.listdir(self._path(path))
+
+    def read(self, path: str) -> bytes:
+        with open(self._path(path), "rb") as f:
+            return f.read()
+
+
+class GitTreeReader(TreeReader):
+    """Reads files straight from the git object store, no working tree needs to be checked out.
+
+    GitPython reads objects through a single `git cat-file` process per repository, which must not be used by
+    several threads at once. All object access is serialized, the reader can be shared by threads.
+    """
+
+    def __init__(self, tree: Tree):
+        self.tree = tree
+        self._lock = threading.RLock()
+
+    def _object(self, path: str):
+        if not path or path == ".":
+            return self.tree
+        try:
+            with self._lock:
+                return self.tree / path
+        except KeyError:
+            return None
+
+    def walk(self, top: str = "") -> Iterator[Tuple[str, List[str], List[str]]]:
+        tree = self._object(top)
+        if tree is None or tree.type != "tree":
+            return
+        stack = [(top if top != "." else "", tree)]
+        while stack:
+            dir_path, tree = stack.pop()
+            with self._lock:
+                dirs = [sub_tree.name for sub_tree in tree.trees]
+                files = [blob.name for blob in tree.blobs]
+            yield dir_path, dirs, files
+            # keep the top-down order of `os.walk`, pruned directories are not descended into
+            with self._lock:
+                for name in reversed(dirs):
+                    stack.append((f"{dir_path}/{name}" if dir_path else name, tree / name))
+
+    def isfile(self, path: str) -> bool:
+        obj = self._object(path)
+        return obj is not None and obj.type == "blob"
+
+    def isdir(self, path: str) -> bool:
+        obj = self._object(path)
+        return obj is not None and obj.type == "tree"
+
+    def listdir(self, path: str) -> List[str]:
+        tree = self._object(path)
+        with self._lock:
+            return [obj.name for obj in tree]
+
+    def read(self, path: str) -> bytes:
+        blob = self._object(path)
+        with self._lock:
+            return blob.data_stream.read()
+
+    def blob_sha(self, path: str) -> str:
+        return self._object(path).hexsha
+
+    def blob(self, path: str) -> Tuple[str, Union[bytes, Callable[[], bytes]]]:
+        return self.blob_sha(path), partial(self.read, path)
@@ -1,22 +1,47 @@
 import collections
 import collections.abc
+import hashlib
 import logging
 import os
 import re
 import subprocess
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 import yaml
 
+from commons.helm.cache import DependencyCache
+from commons.helm.conf import config
 from commons.helm.data_classes import DeckData, RenderEnvironment
 from commons.helm.exceptions import HelmDependencyError
 
 logger = logging.getLogger("projects.helm")
 
+# use the C-accelerated loader and dumper of libyaml if available
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# a fixed number of locks striped by chart directory, so that checkouts in new temporary directories don't add locks
+_dependency_locks = [threading.Lock() for _ in range(64)]
+# chart directory -> (digest of its dependency definitions, state of its `charts/` directory) after the last check
+CHECKED_DEPENDENCIES_SIZE = 1024
+_checked_dependencies = collections.OrderedDict()
+
+MERGED_VALUES_CACHE_SIZE = 256
+_merged_values_cache = collections.OrderedDict()
+_merged_values_cache_lock = threading.Lock()
+
+DEPENDENCY_FILES = ("Chart.yaml", "Chart.lock", "requirements.yaml", "requirements.lock")
+
 
 def execute(cmd, cwd, env=None) -> subprocess.Popen:
     """
     Executes a command in a directory with a certain environment
 
+    The process is waited for, its stdout can be read afterwards. A process which writes more than fits into the pipe
+    blocks, use `run` to read its output while it runs.
+
     :returns Popen
     """
     kwargs = {"encoding": "utf-8", "stdout": subprocess.PIPE}
@@ -32,18 +57,63 @@ def execute(cmd, cwd, env=None) -> subprocess.Popen:
     return process
 
 
+def run(cmd, cwd, env=None, timeout=None) -> subprocess.CompletedProcess:
+    """
+    Runs a command in a directory with a certain environment and returns its output
+
+    stdout and stderr are read while the process runs, so that a process with a lot of output can't block on a full
+    pipe. If `timeout` (seconds) expires, the process is killed and `subprocess.TimeoutExpired` is raised. See
+    `commons.helm.aio.run` for the asyncio counterpart.
+
+    :returns CompletedProcess
+    """
+    kwargs = {"encoding": "utf-8", "stdout": subprocess.PIPE, "stderr": subprocess.PIPE}
+    with subprocess.Popen(cmd, cwd=cwd, env=env, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        except KeyboardInterrupt:
+            try:
+                process.terminate()
+            except OSError:
+                pass
+            stdout, stderr = process.communicate()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+@lru_cache(1)
+def get_helm_version() -> str:
+    """Version of the helm binary, renders of different helm versions may differ."""
+    process = run(["helm", "version", "--short"], cwd=None)
+    return process.stdout.strip()
+
+
+@lru_cache(1)
+def get_base_env() -> Dict[str, str]:
+    """The environment of helm processes, read once: all values must be strings."""
+    return {k: str(v) for k, v in os.environ.items()}
+
+
+def git_blob_sha(content: bytes) -> str:
+    """The SHA git uses for a blob with `content`, as in `git hash-object`."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
 def install_dependencies(directory):
     """Install dependencies for helm charts."""
     logger.debug(f"Running `helm dep up` inside {directory}")
-    process = execute(["helm", "dep", "up"], cwd=directory)
+    process = run(["helm", "dep", "up"], cwd=directory)
     return process.returncode == 0
 
 
 def dependency_update_required(directory):
     """Check whether helm charts' dependencies need to be updated."""
-    process = execute(["helm", "dep", "list"], cwd=directory)
+    process = run(["helm", "dep", "list"], cwd=directory)
     if process.returncode == 0:
-        output_lines = process.stdout.readlines()[1:]
+        output_lines = process.stdout.splitlines()[1:]
         col_re = r"\s*([\w\.]+)\s*"
         for line in output_lines:
             status = re.findall(col_re, line)
@@ -55,17 +125,92 @@ def dependency_update_required(directory):
     return False
 
 
+def _read_dependency_definitions(directory) -> Tuple[str, Optional[list]]:
+    """Digest of the dependency definition files of a chart and its declared dependencies, None if unreadable."""
+    digest = hashlib.sha256()
+    dependencies = []
+    for fname in DEPENDENCY_FILES:
+        path = os.path.join(directory, fname)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        digest.update(f"{fname}\0".encode("utf-8") + content + b"\0")
+        if fname in ("Chart.yaml", "requirements.yaml") and dependencies is not None:
+            try:
+                data = yaml.load(content, Loader=SafeLoader) or {}
+            except yaml.YAMLError:
+                dependencies = None
+                continue
+            if isinstance(data, dict):
+                dependencies.extend(data.get("dependencies") or [])
+    return digest.hexdigest(), dependencies
+
+
+def get_dependency_digest(directory):
+    """Digest of the dependency definitions of a chart, `None` if it has no dependencies that can be cached.
+
+    Charts with local (`file://`) dependencies are never cached, their archives depend on more than these files.
+    """
+    digest, dependencies = _read_dependency_definitions(directory)
+    if not dependencies:
+        return None
+    if any(
+        not isinstance(dependency, dict) or str(dependency.get("repository", "")).startswith("file://")
+        for dependency in dependencies
+    ):
+        return None
+    return digest
+
+
+def _charts_dir_state(directory):
+    try:
+        stat = os.stat(os.path.join(directory, "charts"))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
 def check_helm_dependencies(directory):
-    """Update helm charts' dependencies if needed."""
-    if dependency_update_required(directory):
-        if not install_dependencies(directory):
-            raise HelmDependencyError(f"could not build dependencies in {directory}")
-    else:
-        logger.debug("dep update not required")
+    """Update helm charts' dependencies if needed.
+
+    Resolved dependency archives are kept in a `DependencyCache` by the digest of the dependency definitions and
+    linked into the chart's `charts/` directory, so that `helm dep up` only downloads them once.
+    Concurrent renders of the same chart must not run `helm dep up` in its directory at the same time.
+    """
+    path = os.path.abspath(directory)
+    with _dependency_locks[hash(path) % len(_dependency_locks)]:
+        definitions, dependencies = _read_dependency_definitions(directory)
+        if dependencies == []:
+            # nothing to resolve, don't spawn `helm dep list`
+            return
+        # charts whose dependencies were checked already, as long as their `charts/` directory wasn't touched
+        state = _charts_dir_state(directory)
+        if state is not None and _checked_dependencies.get(path) == (definitions, state):
+            return
+        digest = get_dependency_digest(directory) if config.DEPENDENCY_CACHE_ENABLED else None
+        cache = DependencyCache()
+        if digest and cache.restore(digest, os.path.join(directory, "charts")):
+            logger.debug(f"restored dependencies of {directory} from cache")
+        else:
+            if dependency_update_required(directory):
+                if not install_dependencies(directory):
+                    raise HelmDependencyError(f"could not build dependencies in {directory}")
+            else:
+                logger.debug("dep update not required")
+            if digest:
+                cache.store(digest, os.path.join(directory, "charts"))
+        state = _charts_dir_state(directory)
+        if state is not None:
+            _checked_dependencies[path] = (definitions, state)
+            if len(_checked_dependencies) > CHECKED_DEPENDENCIES_SIZE:
+                _checked_dependencies.popitem(last=False)
 
 
-def get_command(output_dir, values, name, chart, *args, secrets=False):
+def get_command(output_dir, values, name, chart, *args, secrets=False, override_values_file=None):
     # command is: helm template [NAME] [CHART] [flags]
+    # without an `output_dir` the rendered documents are written to stdout
+    # the `override_values_file` is passed last, so that its values take precedence over `values`
     command = ["helm"]
 
     if os.path.isdir(values):
@@ -75,7 +220,8 @@ def get_command(output_dir, values, name, chart, *args, secrets=False):
         command.append("secrets")
 
     command.append("template")
-    command.extend(["--output-dir", output_dir])
+    if output_dir:
+        command.extend(["--output-dir", output_dir])
     command.extend(args)
 
     command.extend(
@@ -86,14 +232,19 @@ def get_command(output_dir, values, name, chart, *args, secrets=False):
             values,
         ]
     )
+    if override_values_file:
+        command.extend(["-f", override_values_file])
     return command
 
 
-def get_additional_render_parameters(deck: DeckData, environment: RenderEnvironment):
+def get_additional_render_parameters(deck: DeckData, environment: RenderEnvironment, override_values: bool = True):
+    """Render parameters of the deck and environment, the override values are passed as `--set` flags unless
+    `override_values` is False (see `unflatten` to pass them as a values file instead).
+    """
     params = []
     if deck.namespace:
         params.extend([f"--namespace={deck.namespace}"])
-    if environment.override_values:
+    if override_values and environment.override_values:
         for k, v in environment.override_values.items():
             params.extend(["--set", f"{k}={v}"])
     return params
@@ -140,34 +291,159 @@ def slugify(text):
     return text
 
 
+# characters with a meaning in the key paths of `helm --set`
+KEY_ESCAPE_RE = re.compile(r"[\\.\[\],=]")
+KEY_UNESCAPE_RE = re.compile(r"\\(.)")
+INTEGER_RE = re.compile(r"[+-]?[0-9]+")
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+def _key_path_re(sep):
+    # keys (with escaped characters), list indices or separators
+    return re.compile(rf"((?:\\.|[^\\\[{re.escape(sep)}])+)|\[(\d+)\]|{re.escape(sep)}")
+
+
+KEY_PATH_RE = _key_path_re(".")
+
+
+def escape_key(key, sep=".") -> str:
+    """Escapes a key for a key path, such that e.g. `app.kubernetes.io/name` stays a single key for `helm --set`.
+
+    Backslashes, brackets, commas, equal signs and the separator are prefixed with a backslash.
+    """
+    key = str(key)
+    escape_re = KEY_ESCAPE_RE if sep == "." else re.compile(f"[\\\\\\[\\],={re.escape(sep)}]")
+    if escape_re.search(key) is None:
+        return key
+    return escape_re.sub(r"\\\g<0>", key)
+
+
 def flatten(d, parent_key="", sep="."):
-    items = []
-    for k, v in d.items():
-        if isinstance(k, str):
-            new_key = parent_key + sep + k if parent_key else k
-        elif isinstance(k, int):
-            new_key = parent_key + "[" + str(k) + "]" if parent_key else k
-        if isinstance(v, collections.MutableMapping):
-            items.extend(flatten(v, new_key, sep=sep).items())
-        elif isinstance(v, list):
-            items.extend(flatten(dict(enumerate(v)), new_key, sep=sep).items())
+    """Flattens nested mappings and lists into a dict of key paths, e.g. `{"a": [{"b": 1}]}` to `{"a[0].b": 1}`.
+
+    Keys are escaped with `escape_key`, empty mappings and lists are left out.
+    """
+    items = {}
+    # depth-first with an explicit stack, children are pushed in reverse to keep their order
+    stack = [(parent_key, d)]
+    while stack:
+        key, value = stack.pop()
+        if isinstance(value, collections.abc.Mapping):
+            for k in reversed(list(value)):
+                escaped = escape_key(k, sep)
+                stack.append((f"{key}{sep}{escaped}" if key else escaped, value[k]))
+        elif isinstance(value, list):
+            for i in range(len(value) - 1, -1, -1):
+                stack.append((f"{key}[{i}]", value[i]))
         else:
-            items.append((new_key, v))
-    return dict(items)
+            items[key] = value
+    return items
+
+
+def split_key_path(key_path, sep=".") -> list:
+    """Splits a key path as created by `flatten` into its unescaped keys and list indices (as int)."""
+    token_re = KEY_PATH_RE if sep == "." else _key_path_re(sep)
+    tokens = []
+    for match in token_re.finditer(str(key_path)):
+        key, index = match.groups()
+        if key is not None:
+            tokens.append(KEY_UNESCAPE_RE.sub(r"\1", key))
+        elif index is not None:
+            tokens.append(int(index))
+    return tokens
+
+
+def typed_value(value):
+    """Types a string value like `helm --set` does: booleans and null in any case, 0 and 64 bit integers without a
+    leading zero. Other values are returned unchanged.
+    """
+    if not isinstance(value, str):
+        return value
+    lowered = value.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    if value == "0":
+        return 0
+    if INTEGER_RE.fullmatch(value) and value[0] != "0":
+        number = int(value)
+        # larger numbers don't parse as int64 and are kept as string
+        if INT64_MIN <= number <= INT64_MAX:
+            return number
+    return value
+
+
+def unflatten(items, sep=".") -> dict:
+    """Nests a dict of key paths as created by `flatten`, like `helm --set` would for each of them.
+
+    Lists are padded with None up to a given index, the values are set unchanged.
+    """
+    result = {}
+    for key_path, value in items.items():
+        tokens = split_key_path(key_path, sep)
+        if not tokens:
+            continue
+        container = result
+        for token, next_token in zip(tokens, tokens[1:]):
+            child_type = list if isinstance(next_token, int) else dict
+            child = _get_item(container, token)
+            if not isinstance(child, child_type):
+                child = child_type()
+                _set_item(container, token, child)
+            container = child
+        _set_item(container, tokens[-1], value)
+    return result
+
+
+def _get_item(container, token):
+    if isinstance(container, list):
+        return container[token] if token < len(container) else None
+    return container.get(token)
+
+
+def _set_item(container, token, value):
+    if isinstance(container, list):
+        container.extend([None] * (token + 1 - len(container)))
+    container[token] = value
 
 
 def update_nested_dict(d, u):
-    for k, v in u.items():
-        if isinstance(v, collections.abc.Mapping):
-            d[k] = update_nested_dict(d.get(k, {}), v)
-        else:
-            d[k] = v
+    """Merges the mapping `u` into `d` in place, nested mappings are merged, everything else is replaced."""
+    stack = [(d, u)]
+    while stack:
+        target, source = stack.pop()
+        for k, v in source.items():
+            if isinstance(v, collections.abc.Mapping):
+                current = target.get(k)
+                if not isinstance(current, collections.abc.MutableMapping):
+                    current = target[k] = {}
+                stack.append((current, v))
+            else:
+                target[k] = v
     return d
 
 
 def merge_multiple_yaml_files(*args):
+    """Merges YAML documents, later ones take precedence.
+
+    The results are cached by the digests of the documents, so that environments sharing the same values files
+    are merged only once.
+    """
+    key = tuple(hashlib.sha256(arg.encode("utf-8")).hexdigest() for arg in args)
+    with _merged_values_cache_lock:
+        if key in _merged_values_cache:
+            _merged_values_cache.move_to_end(key)
+            return _merged_values_cache[key]
     big_data = {}
     for i in args:
-        data = yaml.load(i, Loader=yaml.SafeLoader)
-        update_nested_dict(big_data, data)
-    return yaml.dump(big_data)
+        data = yaml.load(i, Loader=SafeLoader)
+        if data:
+            update_nested_dict(big_data, data)
+    result = yaml.dump(big_data)
+    with _merged_values_cache_lock:
+        _merged_values_cache[key] = result
+        if len(_merged_values_cache) > MERGED_VALUES_CACHE_SIZE:
+            _merged_values_cache.popitem(last=False)
+    return result
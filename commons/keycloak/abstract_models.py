@@ -1,4 +1,5 @@
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 
 try:
@@ -77,10 +78,13 @@ class KeycloakResource(models.Model):
 
     def create_keycloak_groups(self, associate_perms=True):
         gh = GroupHandler()
-        # admin group
-        admin_group_id = gh.create(f"{self._meta.model_name}-{self.get_keycloak_name()}-{self.ADMINS}")
-        # member group
-        member_group_id = gh.create(f"{self._meta.model_name}-{self.get_keycloak_name()}")
+        # the admin and member groups are independent, hence they are created concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            admin_group = executor.submit(
+                gh.create, f"{self._meta.model_name}-{self.get_keycloak_name()}-{self.ADMINS}"
+            )
+            member_group = executor.submit(gh.create, f"{self._meta.model_name}-{self.get_keycloak_name()}")
+        admin_group_id, member_group_id = admin_group.result(), member_group.result()
         self.keycloak_data["groups"] = {self.ADMINS: admin_group_id, self.MEMBERS: member_group_id}
         self.save(update_fields=("keycloak_data",))
         if associate_perms:
@@ -0,0 +1,145 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Callable, List, Optional
+
+from commons.keycloak.conf import config
+from commons.keycloak.groups import GroupHandler
+from commons.keycloak.resources import ResourceHandler
+from commons.keycloak.users import UserHandler
+
+
+class AsyncKeycloakClient:
+    """The operations of `GroupHandler`, `UserHandler` and `ResourceHandler` as coroutines:
+    client = AsyncKeycloakClient()
+    admin_group_id, member_group_id = await asyncio.gather(
+        client.groups.create("project-admins"), client.groups.create("project-members")
+    )
+
+    The handlers run in a pool of `max_concurrency` threads (`KEYCLOAK_POOL_SIZE` by default), which limits the number
+    of concurrent requests. All requests go through the shared `KeycloakSession` and its connection pool.
+    """
+
+    def __init__(self, max_concurrency: int = None, token: Optional[str] = None):
+        self.max_concurrency = max_concurrency or config.POOL_SIZE
+        self.token = token
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="keycloak")
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Runs a blocking Keycloak call in the pool of this client."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @cached_property
+    def groups(self) -> "AsyncGroupHandler":
+        return AsyncGroupHandler(self)
+
+    @cached_property
+    def users(self) -> "AsyncUserHandler":
+        return AsyncUserHandler(self)
+
+    @cached_property
+    def resources(self) -> "AsyncResourceHandler":
+        return AsyncResourceHandler(self)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class _AsyncHandler:
+    handler_class = None
+
+    def __init__(self, client: AsyncKeycloakClient):
+        self.client = client
+
+    @cached_property
+    def handler(self):
+        # the admin handlers look up a valid token per request, so one instance serves all calls
+        return self.handler_class(token=self.client.token)
+
+    async def get(self, _id: str) -> dict:
+        return await self.client.run(self.handler.get, _id)
+
+    async def delete(self, _id: str) -> int:
+        return await self.client.run(self.handler.delete, _id)
+
+
+class AsyncGroupHandler(_AsyncHandler):
+    handler_class = GroupHandler
+
+    async def create(self, name: str) -> str:
+        return await self.client.run(self.handler.create, name)
+
+    async def members(self, group_id: str):
+        return await self.client.run(self.handler.members, group_id)
+
+
+class AsyncUserHandler(_AsyncHandler):
+    handler_class = UserHandler
+
+    async def join_group(self, user_id: str, group_id: str):
+        return await self.client.run(self.handler.join_group, user_id, group_id)
+
+    async def leave_group(self, user_id: str, group_id: str):
+        return await self.client.run(self.handler.leave_group, user_id, group_id)
+
+    async def count_groups(self, user_id: str) -> int:
+        return await self.client.run(self.handler.count_groups, user_id)
+
+    async def groups(self, user_id: str):
+        return await self.client.run(self.handler.groups, user_id)
+
+    async def create(self, data: dict) -> str:
+        return await self.client.run(self.handler.create, data)
+
+    async def update(self, user_id: str, data: dict) -> dict:
+        return await self.client.run(self.handler.update, user_id, data)
+
+
+class AsyncResourceHandler(_AsyncHandler):
+    handler_class = ResourceHandler
+
+    def _handler(self) -> ResourceHandler:
+        # a `ResourceHandler` keeps the token it was created with, hence every call creates a new one
+        return self.handler_class(token=self.client.token)
+
+    async def _call(self, method: str, *args, **kwargs):
+        def call():
+            return getattr(self._handler(), method)(*args, **kwargs)
+
+        return await self.client.run(call)
+
+    async def get(self, resource_id: str) -> dict:
+        return await self._call("get", resource_id)
+
+    async def delete(self, resource_id: str) -> int:
+        return await self._call("delete", resource_id)
+
+    async def create(self, content_type: str, object_uuid: str, name: Optional[str] = None) -> str:
+        return await self._call("create", content_type, object_uuid, name)
+
+    async def associate_permission(
+        self,
+        resource_id: str,
+        name: str,
+        scopes: List[str],
+        groups: List[str],
+        logic: str = "POSITIVE",
+        decision_strategy: str = "UNANIMOUS",
+    ) -> dict:
+        return await self._call(
+            "associate_permission",
+            resource_id,
+            name,
+            scopes=scopes,
+            groups=groups,
+            logic=logic,
+            decision_strategy=decision_strategy,
+        )
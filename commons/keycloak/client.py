@@ -1,3 +1,5 @@
+import threading
+import time
 from functools import lru_cache
 from typing import Callable, Optional, Union
 from urllib.parse import urljoin
@@ -9,11 +11,15 @@ from keycloak.realm import KeycloakRealm
 from keycloak.uma import KeycloakUMA
 
 from commons.keycloak.conf import config
+from commons.keycloak.transport import get_session
 
 
 @lru_cache(1)
 def get_realm():
-    return KeycloakRealm(server_url=config.SERVER_URL, realm_name=config.REALM_NAME)
+    realm = KeycloakRealm(server_url=config.SERVER_URL, realm_name=config.REALM_NAME)
+    # the admin, OpenID Connect and UMA clients of the realm all send their requests through the shared session
+    realm.client._session = get_session()
+    return realm
 
 
 def get_oidc_client() -> KeycloakOpenidConnect:
@@ -41,8 +47,71 @@ def get_authz_client() -> KeycloakAuthz:
     return realm.authz(client_id=config.CLIENT_ID)
 
 
+class TokenCache:
+    """Caches the access token returned by `fetch` until shortly before it expires.
+
+    A token is refreshed once it is valid for less than `TOKEN_REFRESH_MARGIN` seconds (or half its lifetime). Only one
+    thread requests a new token at a time: while a still valid token is refreshed, other threads keep using it, once it
+    expired they wait for the refresh. `hits` and `misses` count the calls to `get` served from the cache and those
+    which requested a new token.
+    """
+
+    def __init__(self, fetch: Callable[[], dict]):
+        self.fetch = fetch
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (key, token, refresh at, expires at), replaced as a whole so that readers never see a partial update
+        self._entry = (None, None, 0.0, 0.0)
+
+    @staticmethod
+    def _current_key() -> tuple:
+        return config.SERVER_URL, config.REALM_NAME, config.CLIENT_ID
+
+    def get(self) -> str:
+        key = self._current_key()
+        cached_key, token, refresh_at, expires_at = self._entry
+        now = time.monotonic()
+        if cached_key == key and now < refresh_at:
+            self.hits += 1
+            return token
+        # a still valid token is handed out while another thread refreshes it
+        if not self._lock.acquire(blocking=cached_key != key or now >= expires_at):
+            self.hits += 1
+            return token
+        try:
+            # the token may have been refreshed while this thread was waiting
+            cached_key, token, refresh_at, _ = self._entry
+            if cached_key == key and time.monotonic() < refresh_at:
+                self.hits += 1
+                return token
+            self.misses += 1
+            return self._refresh(key)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, key: tuple) -> str:
+        requested_at = time.monotonic()
+        response = self.fetch()
+        expires_in = float(response.get("expires_in", 0))
+        expires_at = requested_at + expires_in
+        refresh_at = expires_at - min(config.TOKEN_REFRESH_MARGIN, expires_in / 2)
+        self._entry = (key, response["access_token"], refresh_at, expires_at)
+        return response["access_token"]
+
+    def invalidate(self) -> None:
+        self._entry = (None, None, 0.0, 0.0)
+
+
+def _request_admin_token() -> dict:
+    return get_oidc_client().client_credentials()
+
+
+admin_token_cache = TokenCache(_request_admin_token)
+
+
 def admin_token_getter() -> str:
-    return get_oidc_client().client_credentials()["access_token"]
+    return admin_token_cache.get()
 
 
 def get_admin(token: Optional[Union[Callable[[], str], str]] = None) -> KeycloakAdmin:
@@ -51,8 +120,9 @@ def get_admin(token: Optional[Union[Callable[[], str], str]] = None) -> Keycloak
     :return:
     """
     if token is None:
+        # resolved per request, so that long-lived handlers keep getting valid tokens from the cache
         token = admin_token_getter
-    if callable(token):
+    elif callable(token):
         token = token()
     realm = get_realm()
     admin = realm.admin
@@ -7,6 +7,16 @@ DEFAULTS = {
     "KEYCLOAK_REALM_NAME": "unikube",
     "KEYCLOAK_PORT": 8080,
     "KEYCLOAK_SCHEME": "https",
+    # seconds before its expiry a cached admin token is refreshed
+    "KEYCLOAK_TOKEN_REFRESH_MARGIN": 30,
+    # connections per host of the shared session and its default request timeout in seconds
+    "KEYCLOAK_POOL_SIZE": 10,
+    "KEYCLOAK_TIMEOUT": 10,
+    # retries of failed idempotent requests, waiting up to KEYCLOAK_RETRY_BACKOFF seconds (doubled per attempt)
+    "KEYCLOAK_RETRIES": 2,
+    "KEYCLOAK_RETRY_BACKOFF": 0.5,
+    # items requested per page when iterating over group members or groups of a user
+    "KEYCLOAK_PAGE_SIZE": 100,
 }
 
 
@@ -31,6 +41,12 @@ class KeycloakConfig:
         self.REALM_NAME = self._resolve("KEYCLOAK_REALM_NAME")
         self.CLIENT_ID = self._resolve("KEYCLOAK_CLIENT_ID")
         self.CLIENT_SECRET = self._resolve("KEYCLOAK_CLIENT_SECRET")
+        self.TOKEN_REFRESH_MARGIN = int(self._resolve("KEYCLOAK_TOKEN_REFRESH_MARGIN"))
+        self.POOL_SIZE = int(self._resolve("KEYCLOAK_POOL_SIZE"))
+        self.TIMEOUT = float(self._resolve("KEYCLOAK_TIMEOUT"))
+        self.RETRIES = int(self._resolve("KEYCLOAK_RETRIES"))
+        self.RETRY_BACKOFF = float(self._resolve("KEYCLOAK_RETRY_BACKOFF"))
+        self.PAGE_SIZE = int(self._resolve("KEYCLOAK_PAGE_SIZE"))
 
     def _resolve(self, name):
         unset = object()
@@ -43,7 +59,20 @@ class KeycloakConfig:
 config = KeycloakConfig()
 
 
-def configure(scheme=None, host=None, port=None, realm_name=None, client_id=None, client_secret=None):
+def configure(
+    scheme=None,
+    host=None,
+    port=None,
+    realm_name=None,
+    client_id=None,
+    client_secret=None,
+    token_refresh_margin=None,
+    pool_size=None,
+    timeout=None,
+    retries=None,
+    retry_backoff=None,
+    page_size=None,
+):
     global config
     _override = KeycloakConfig(
         KEYCLOAK_SCHEME=scheme,
@@ -52,8 +81,20 @@ def configure(scheme=None, host=None, port=None, realm_name=None, client_id=None
         KEYCLOAK_REALM_NAME=realm_name,
         KEYCLOAK_CLIENT_ID=client_id,
         KEYCLOAK_CLIENT_SECRET=client_secret,
+        KEYCLOAK_TOKEN_REFRESH_MARGIN=token_refresh_margin,
+        KEYCLOAK_POOL_SIZE=pool_size,
+        KEYCLOAK_TIMEOUT=timeout,
+        KEYCLOAK_RETRIES=retries,
+        KEYCLOAK_RETRY_BACKOFF=retry_backoff,
+        KEYCLOAK_PAGE_SIZE=page_size,
     )
     config.SERVER_URL = _override.SERVER_URL
     config.REALM_NAME = _override.REALM_NAME
     config.CLIENT_ID = _override.CLIENT_ID
     config.CLIENT_SECRET = _override.CLIENT_SECRET
+    config.TOKEN_REFRESH_MARGIN = _override.TOKEN_REFRESH_MARGIN
+    config.POOL_SIZE = _override.POOL_SIZE
+    config.TIMEOUT = _override.TIMEOUT
+    config.RETRIES = _override.RETRIES
+    config.RETRY_BACKOFF = _override.RETRY_BACKOFF
+    config.PAGE_SIZE = _override.PAGE_SIZE
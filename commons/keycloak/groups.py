@@ -1,3 +1,5 @@
+from typing import Iterator, Set
+
 from commons.keycloak.conf import config
 from commons.keycloak.handler import UUID, KCAdminHandler
 
@@ -10,6 +12,20 @@ class GroupHandler(KCAdminHandler):
         response_data = self._call_api(url, method="post", json={"name": name})
         return UUID.search(response_data["headers"]["location"]).group(0)
 
-    def members(self, group_id: str):
+    def members(self, group_id: str, first: int = None, max_results: int = None, brief: bool = None):
+        """
+        Returns all members, or only those of the page given by `first` and `max_results`. With `brief` Keycloak
+        omits attributes and other details of the users.
+        """
+        if first is None and max_results is None:
+            return list(self.iter_members(group_id, brief=brief))
+        url = f"{self.admin.get_full_url(self.base_path)}{group_id}/members"
+        params = {key: value for key, value in (("first", first), ("max", max_results)) if value is not None}
+        return self._call_api(url, params={**params, **self._representation(brief)})["data"]
+
+    def iter_members(self, group_id: str, page_size: int = None, brief: bool = None) -> Iterator[dict]:
         url = f"{self.admin.get_full_url(self.base_path)}{group_id}/members"
-        return self._call_api(url)["data"]
+        return self._paginate(url, page_size, self._representation(brief))
+
+    def member_ids(self, group_id: str, page_size: int = None) -> Set[str]:
+        return {member["id"] for member in self.iter_members(group_id, page_size, brief=True)}
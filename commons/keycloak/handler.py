@@ -1,9 +1,11 @@
 import re
-from typing import Dict, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Union
 
 from requests import Response
 
 from commons.keycloak.client import get_admin, get_realm
+from commons.keycloak.conf import config
 
 UUID = re.compile(r"\b[0-9a-f]{8}\b-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-\b[0-9a-f]{12}\b")
 
@@ -14,14 +16,18 @@ class KCAdminHandler:
 
     def __init__(self, token: Optional[str] = None):
         self.realm = get_realm()
+        self.token = token
         self.admin = get_admin(token=token)
 
     def _call_api(
-        self, url, method="get", params=None, data=None, json=None, headers=None
+        self, url, method="get", params=None, data=None, json=None, headers=None, timeout=None
     ) -> Dict[str, Union[Dict, int]]:
+        """
+        Requests go through the shared `KeycloakSession`, `timeout` (seconds) overrides its default timeout.
+        """
         handler = getattr(self.realm.client.session, method)
         response: Response = handler(
-            url, headers=self._add_auth_header(headers=headers), params=params, data=data, json=json
+            url, headers=self._add_auth_header(headers=headers), params=params, data=data, json=json, timeout=timeout
         )
         response.raise_for_status()
         try:
@@ -34,6 +40,36 @@ class KCAdminHandler:
             "status_code": response.status_code,
         }
 
+    def _paginate(self, url, page_size: int = None, params: dict = None) -> Iterator[dict]:
+        """
+        Yields the items of a paged collection, which are requested `page_size` (`KEYCLOAK_PAGE_SIZE` by default) at
+        a time with `first` and `max`. The next page is requested in the background while the current one is consumed.
+        """
+        page_size = page_size or config.PAGE_SIZE
+        params = params or {}
+
+        def fetch(first: int) -> list:
+            return self._call_api(url, params={**params, "first": first, "max": page_size})["data"]
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="keycloak-pages")
+        try:
+            first = 0
+            page = fetch(first)
+            while True:
+                # a short page is the last one
+                upcoming = executor.submit(fetch, first + page_size) if len(page) >= page_size else None
+                yield from page
+                if upcoming is None:
+                    return
+                first += page_size
+                page = upcoming.result()
+        finally:
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _representation(brief: Optional[bool]) -> dict:
+        return {} if brief is None else {"briefRepresentation": "true" if brief else "false"}
+
     def _add_auth_header(self, headers=None):
         t = self.admin._token
         if callable(t):
@@ -15,8 +15,7 @@ class ResourceHandler:
 
     def __init__(self, token: Optional[str] = None):
         self.uma_client: KeycloakUMA = get_uma_client()
-        if token is None:
-            self.token = admin_token_getter()
+        self.token = token if token is not None else admin_token_getter()
 
     def _kind(self, content_type: str) -> str:
         return f"{self.KIND}{self.SCOPE_SEP}{content_type.lower()}"
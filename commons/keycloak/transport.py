@@ -0,0 +1,112 @@
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from commons.keycloak.conf import config
+
+logger = logging.getLogger(__name__)
+
+# methods which may be sent again without changing the outcome
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# responses of an overloaded or restarting server
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+
+def _not_connected(error: Exception) -> bool:
+    """Whether the request failed before it was sent, because no connection could be established."""
+    if isinstance(error, ConnectTimeout):
+        return True
+    # a refused connection or unresolvable host, see `HTTPAdapter.send`
+    reason = error.args[0] if error.args else None
+    return isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError)
+
+
+@dataclass
+class TransportMetrics:
+    """Counters of a `KeycloakSession`, latencies are in seconds and include failed attempts."""
+
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+
+class KeycloakSession(requests.Session):
+    """A session with a connection pool of `pool_size` connections per host, a default `timeout` (seconds) and retries.
+
+    Requests with an idempotent method are sent up to `retries` more times if the connection failed, timed out or
+    the server responded with 502, 503 or 504. Other requests are only repeated if no connection could be established.
+    Retries wait for a random time up to `backoff` seconds, doubled with every attempt.
+    """
+
+    def __init__(self, pool_size: int = 10, timeout: float = 10, retries: int = 2, backoff: float = 0.5):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._metrics = TransportMetrics()
+        self._lock = threading.Lock()
+
+    @property
+    def metrics(self) -> TransportMetrics:
+        with self._lock:
+            return replace(self._metrics)
+
+    def _record(self, started_at: float, failed: bool) -> None:
+        latency = time.perf_counter() - started_at
+        with self._lock:
+            self._metrics.requests += 1
+            self._metrics.failures += failed
+            self._metrics.total_latency += latency
+            self._metrics.max_latency = max(self._metrics.max_latency, latency)
+
+    def request(self, method, url, *args, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            started_at = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                self._record(started_at, failed=True)
+                if attempt >= self.retries or not (idempotent or _not_connected(e)):
+                    raise
+                reason = repr(e)
+            else:
+                self._record(started_at, failed=response.status_code >= 500)
+                if attempt >= self.retries or not idempotent or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                response.close()
+                reason = f"status {response.status_code}"
+            attempt += 1
+            with self._lock:
+                self._metrics.retries += 1
+            delay = random.uniform(0, self.backoff * (1 << (attempt - 1)))
+            logger.debug(f"retrying {method} {url} in {delay:.2f}s ({reason})")
+            time.sleep(delay)
+
+
+@lru_cache(1)
+def get_session() -> KeycloakSession:
+    """The session which all Keycloak clients and handlers of this process share."""
+    return KeycloakSession(
+        pool_size=config.POOL_SIZE, timeout=config.TIMEOUT, retries=config.RETRIES, backoff=config.RETRY_BACKOFF
+    )
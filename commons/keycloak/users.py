@@ -1,6 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from requests import RequestException
+
 from commons.keycloak.conf import config
+from commons.keycloak.groups import GroupHandler
 from commons.keycloak.handler import UUID, KCAdminHandler
 
+JOINED = "joined"
+LEFT = "left"
+UNCHANGED = "unchanged"
+
+
+@dataclass
+class MembershipResult:
+    """The outcome of a bulk membership operation for one user, `error` is set if its request failed."""
+
+    user_id: str
+    action: str
+    status_code: Optional[int] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
 class UserHandler(KCAdminHandler):
     base_path = f"auth/admin/realms/{config.REALM_NAME}/users/"
@@ -17,9 +42,17 @@ class UserHandler(KCAdminHandler):
         url = f"{self.admin.get_full_url(self.base_path)}{user_id}/groups/count"
         return self._call_api(url)["data"]["count"]
 
-    def groups(self, user_id: str):
+    def groups(self, user_id: str, first: int = None, max_results: int = None, brief: bool = None):
+        """Returns all groups of the user, or only those of the page given by `first` and `max_results`."""
+        if first is None and max_results is None:
+            return list(self.iter_groups(user_id, brief=brief))
+        url = f"{self.admin.get_full_url(self.base_path)}{user_id}/groups"
+        params = {key: value for key, value in (("first", first), ("max", max_results)) if value is not None}
+        return self._call_api(url, params={**params, **self._representation(brief)})["data"]
+
+    def iter_groups(self, user_id: str, page_size: int = None, brief: bool = None) -> Iterator[dict]:
         url = f"{self.admin.get_full_url(self.base_path)}{user_id}/groups"
-        return self._call_api(url)["data"]
+        return self._paginate(url, page_size, self._representation(brief))
 
     def create(self, data: dict) -> str:
         url = f"{self.admin.get_full_url(self.base_path)}"
@@ -44,3 +77,66 @@ class UserHandler(KCAdminHandler):
         url = f"{self.admin.get_full_url(self.base_path)}{user_id}"
         response_data = self._call_api(url, method="put", json=data)
         return response_data["status_code"]
+
+    def _update_memberships(
+        self, group_id: str, join: Iterable[str], leave: Iterable[str], max_concurrency: int = None
+    ) -> Dict[str, MembershipResult]:
+        def run(method: Callable, action: str, user_id: str) -> MembershipResult:
+            try:
+                return MembershipResult(user_id, action, status_code=method(user_id, group_id))
+            except RequestException as e:
+                return MembershipResult(user_id, action, status_code=getattr(e.response, "status_code", None), error=e)
+
+        calls = [(self.join_group, JOINED, user_id) for user_id in join]
+        calls += [(self.leave_group, LEFT, user_id) for user_id in leave]
+        if not calls:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_concurrency or config.POOL_SIZE, len(calls))) as executor:
+            results = executor.map(lambda call: run(*call), calls)
+            return {result.user_id: result for result in results}
+
+    def join_groups(
+        self, user_ids: Iterable[str], group_id: str, max_concurrency: int = None
+    ) -> Dict[str, MembershipResult]:
+        """
+        Adds all users to the group, users which are members already are skipped. Up to `max_concurrency` requests
+        (`KEYCLOAK_POOL_SIZE` by default) run at a time. Returns a `MembershipResult` per user id, failed requests do
+        not abort the others but are reported with their error.
+        """
+        members = GroupHandler(token=self.token).member_ids(group_id)
+        user_ids = list(dict.fromkeys(user_ids))
+        results = self._update_memberships(
+            group_id, [user_id for user_id in user_ids if user_id not in members], [], max_concurrency
+        )
+        return {user_id: results.get(user_id) or MembershipResult(user_id, UNCHANGED) for user_id in user_ids}
+
+    def leave_groups(
+        self, user_ids: Iterable[str], group_id: str, max_concurrency: int = None
+    ) -> Dict[str, MembershipResult]:
+        """Removes all users from the group, like `join_groups` users which aren't members are skipped."""
+        members = GroupHandler(token=self.token).member_ids(group_id)
+        user_ids = list(dict.fromkeys(user_ids))
+        results = self._update_memberships(
+            group_id, [], [user_id for user_id in user_ids if user_id in members], max_concurrency
+        )
+        return {user_id: results.get(user_id) or MembershipResult(user_id, UNCHANGED) for user_id in user_ids}
+
+    def sync_group_members(
+        self, group_id: str, desired_user_ids: Iterable[str], max_concurrency: int = None
+    ) -> Dict[str, MembershipResult]:
+        """
+        Makes the desired users the only members of the group: missing users join it, all other members leave it.
+        Returns a `MembershipResult` per user id of either set, see `join_groups`.
+        """
+        members = GroupHandler(token=self.token).member_ids(group_id)
+        desired = list(dict.fromkeys(desired_user_ids))
+        desired_set = set(desired)
+        results = self._update_memberships(
+            group_id,
+            [user_id for user_id in desired if user_id not in members],
+            [user_id for user_id in members if user_id not in desired_set],
+            max_concurrency,
+        )
+        for user_id in desired:
+            results.setdefault(user_id, MembershipResult(user_id, UNCHANGED))
+        return results
@@ -0,0 +1,183 @@
+import asyncio
+from unittest import TestCase, mock
+
+from pika.exceptions import ChannelClosedByBroker, ChannelWrongStateError, ConnectionClosedByClient
+
+from commons.amqp import aio
+from commons.amqp.aio import AsyncTopicProducer
+
+
+class FakeChannel:
+    def __init__(self, connection, on_open_callback):
+        self.connection = connection
+        self.is_open = True
+        self.published = []
+        self.on_close_callbacks = []
+        asyncio.get_running_loop().call_soon(on_open_callback, self)
+
+    def add_on_close_callback(self, callback):
+        self.on_close_callbacks.append(callback)
+
+    def exchange_declare(self, exchange, exchange_type, passive, durable, callback):
+        asyncio.get_running_loop().call_soon(callback, None)
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if not self.is_open:
+            raise ChannelWrongStateError("Channel is closed.")
+        if body == b'{"body": "invalid"}':
+            raise ValueError("invalid message")
+        self.published.append((routing_key, body))
+        self.connection._transport.buffered += len(body)
+
+    def close(self, reason=None):
+        self.is_open = False
+        for callback in self.on_close_callbacks:
+            asyncio.get_running_loop().call_soon(callback, self, reason or ChannelClosedByBroker(404, "closed"))
+
+
+class FakeTransport:
+    def __init__(self):
+        self.buffered = 0
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+
+class FakeConnection:
+    def __init__(self, parameters, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        self.is_open = True
+        self.is_closed = False
+        self.channels = []
+        self.on_close_callback = on_close_callback
+        self.on_blocked_callbacks = []
+        self.on_unblocked_callbacks = []
+        self._transport = FakeTransport()
+        custom_ioloop.call_soon(on_open_callback, self)
+
+    def add_on_connection_blocked_callback(self, callback):
+        self.on_blocked_callbacks.append(callback)
+
+    def add_on_connection_unblocked_callback(self, callback):
+        self.on_unblocked_callbacks.append(callback)
+
+    def block(self, blocked=True):
+        for callback in self.on_blocked_callbacks if blocked else self.on_unblocked_callbacks:
+            callback(self, None)
+
+    def channel(self, on_open_callback):
+        channel = FakeChannel(self, on_open_callback)
+        self.channels.append(channel)
+        return channel
+
+    def close(self):
+        self.is_open = False
+        self.is_closed = True
+        asyncio.get_running_loop().call_soon(self.on_close_callback, self, ConnectionClosedByClient(200, "Normal"))
+
+
+class AsyncProducerTests(TestCase):
+    def setUp(self):
+        self.connections = []
+        patcher = mock.patch.object(aio, "AsyncioConnection", side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, *args, **kwargs):
+        connection = FakeConnection(*args, **kwargs)
+        self.connections.append(connection)
+        return connection
+
+    def test_publish_and_close(self):
+        async def publish():
+            producer = AsyncTopicProducer("localhost", 5672, exchange="test", routing_key="test")
+            await producer.publish({"body": "one"})
+            await producer.publish_many([{"body": "two"}, ("other", {"body": "three"})])
+            await producer.close()
+
+        asyncio.run(publish())
+        self.assertEqual(len(self.connections), 1)
+        self.assertTrue(self.connections[0].is_closed)
+        self.assertEqual(
+            self.connections[0].channels[0].published,
+            [("test", b'{"body": "one"}'), ("test", b'{"body": "two"}'), ("other", b'{"body": "three"}')],
+        )
+
+    def test_content_type(self):
+        class JSONProducer(AsyncTopicProducer):
+            content_type = "application/json"
+
+        routing_key, body, properties = JSONProducer("localhost", 5672, routing_key="test")._encode({"body": "one"})
+        self.assertEqual(properties.content_type, "application/json")
+
+    def test_full_buffer(self):
+        async def publish():
+            producer = AsyncTopicProducer("localhost", 5672, exchange="test", routing_key="test", max_buffer_size=2)
+            producer.publish_nowait({"body": "one"})
+            producer.publish_nowait({"body": "two"})
+            with self.assertRaises(asyncio.QueueFull):
+                producer.publish_nowait({"body": "three"})
+            # waits until the sender made room
+            await asyncio.wait_for(producer.publish({"body": "three"}), 1)
+            await producer.close()
+
+        asyncio.run(publish())
+        self.assertEqual(len(self.connections[0].channels[0].published), 3)
+
+    def test_reconnect(self):
+        async def publish():
+            producer = AsyncTopicProducer("localhost", 5672, exchange="test", routing_key="test")
+            await producer.publish({"body": "one"})
+            await producer.flush()
+            self.connections[0].channels[0].close()
+            await producer.publish({"body": "two"})
+            await producer.close()
+
+        asyncio.run(publish())
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual([len(channel.published) for channel in self.connections[0].channels], [1, 1])
+
+    def test_blocked_connection(self):
+        async def publish():
+            producer = AsyncTopicProducer("localhost", 5672, exchange="test", routing_key="test")
+            await producer.publish({"body": "one"})
+            await producer.flush()
+            connection = self.connections[0]
+            connection.block()
+            await producer.publish({"body": "two"})
+            await producer.publish({"body": "three"})
+            await asyncio.sleep(0.01)
+            # the message taken before the connection got blocked is sent, the next one is held back
+            self.assertEqual(len(connection.channels[0].published), 2)
+            connection.block(False)
+            await asyncio.wait_for(producer.close(), 1)
+
+        asyncio.run(publish())
+        self.assertEqual(len(self.connections[0].channels[0].published), 3)
+
+    def test_write_buffer_backpressure(self):
+        async def publish():
+            producer = AsyncTopicProducer(
+                "localhost", 5672, exchange="test", routing_key="test", max_write_buffer_size=20
+            )
+            await producer.publish_many([{"body": "one"}, {"body": "two"}, {"body": "three"}])
+            await asyncio.sleep(0.01)
+            connection = self.connections[0]
+            # each message adds 15 bytes to the write buffer, the sender waits once it holds more than 20
+            self.assertEqual(len(connection.channels[0].published), 2)
+            connection._transport.buffered = 0
+            await asyncio.wait_for(producer.close(), 1)
+
+        asyncio.run(publish())
+        self.assertEqual(len(self.connections[0].channels[0].published), 3)
+
+    def test_sender_survives_unexpected_errors(self):
+        async def publish():
+            producer = AsyncTopicProducer("localhost", 5672, exchange="test", routing_key="test")
+            with self.assertLogs(aio.logger, "ERROR"):
+                await producer.publish({"body": "invalid"})
+                await asyncio.wait_for(producer.flush(), 1)
+            await producer.publish({"body": "one"})
+            await asyncio.wait_for(producer.close(), 1)
+
+        asyncio.run(publish())
+        self.assertEqual(self.connections[0].channels[0].published, [("test", b'{"body": "one"}')])
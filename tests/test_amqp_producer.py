@@ -1,7 +1,10 @@
 import json
+from unittest import TestCase, mock
 
 from hurricane.testing import HurricaneAMQPDriver, HurricaneAMQPTest
+from pika.exceptions import StreamLostError
 
+from commons.amqp import producer
 from commons.amqp.producer import TopicProducer
 
 
@@ -88,3 +91,89 @@ class AMQPProducerTests(HurricaneAMQPTest):
             self.driver.stop_amqp()
             if _exc:
                 raise _exc
+
+
+class MockedConnectionTestCase(TestCase):
+    def setUp(self):
+        self.connections = []
+        patcher = mock.patch.object(producer, "BlockingConnection", side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(producer.connection_pool.close)
+
+    def connect(self, parameters):
+        connection = mock.MagicMock(is_open=True)
+        connection.channel.side_effect = lambda: mock.MagicMock(is_open=True, connection=connection)
+        self.connections.append(connection)
+        return connection
+
+
+class ConnectionPoolTests(MockedConnectionTestCase):
+    def test_channel_is_reused(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp2 = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp.publish({"body": "one"})
+        tp.publish({"body": "two"})
+        tp2.publish({"body": "three"})
+        self.assertEqual(len(self.connections), 1)
+        # one channel per producer
+        self.assertEqual(self.connections[0].channel.call_count, 2)
+
+    def test_reconnect(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp._get_channel().basic_publish.side_effect = StreamLostError("lost")
+        self.connections[0].is_open = False
+        tp.publish({"body": "one"})
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(tp._get_channel().basic_publish.called)
+
+    def test_content_type(self):
+        class JSONProducer(TopicProducer):
+            content_type = "application/json"
+
+        tp = JSONProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp.publish({"body": "one"})
+        properties = tp._get_channel().basic_publish.call_args.args[3]
+        self.assertEqual(properties.content_type, "application/json")
+
+
+class PublishManyTests(MockedConnectionTestCase):
+    def test_publish_many(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp.publish_many([{"body": "one"}, ("other", {"body": "two"})])
+        channel = tp._get_channel()
+        self.assertEqual(
+            [c.args[1:3] for c in channel.basic_publish.call_args_list],
+            [("test", b'{"body": "one"}'), ("other", b'{"body": "two"}')],
+        )
+        self.assertFalse(channel.tx_select.called)
+
+    def test_batch_is_confirmed_once(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        with tp.batch(confirm=True) as batch:
+            for i in range(10):
+                batch.publish({"body": i}, routing_key=f"test.{i}")
+        channel = tp._get_channel(transactional=True)
+        self.assertEqual(channel.basic_publish.call_count, 10)
+        channel.tx_select.assert_called_once_with()
+        channel.tx_commit.assert_called_once_with()
+        # regular publishing does not use the transactional channel
+        self.assertFalse(tp._get_channel().tx_select.called)
+
+    def test_failed_batch_is_not_published(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        with self.assertRaises(ValueError):
+            with tp.batch() as batch:
+                batch.publish({"body": "one"})
+                raise ValueError()
+        self.assertFalse(tp._get_channel().basic_publish.called)
+
+    def test_confirmed_batch_is_retried(self):
+        tp = TopicProducer("localhost", 5672, exchange="test", routing_key="test")
+        tp._get_channel(transactional=True).tx_commit.side_effect = StreamLostError("lost")
+        self.connections[0].is_open = False
+        tp.publish_many([{"body": "one"}, {"body": "two"}], confirm=True)
+        self.assertEqual(len(self.connections), 2)
+        channel = tp._get_channel(transactional=True)
+        self.assertEqual(channel.basic_publish.call_count, 2)
+        channel.tx_commit.assert_called_once_with()
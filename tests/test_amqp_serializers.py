@@ -0,0 +1,65 @@
+import datetime
+import json
+import uuid
+import zlib
+from unittest import TestCase, skipIf
+
+from django.core.exceptions import ImproperlyConfigured
+
+from commons.amqp import serializers
+from commons.amqp.serializers import JSONSerializer, MessageEncoder, ZlibCompressor
+
+MESSAGE = {
+    "id": uuid.UUID("7f4b3a4e-5f0a-4ac8-9a3c-1b7b0e9d3f10"),
+    "created": datetime.datetime(2021, 5, 1, 12, 30),
+    "body": "This is a test message",
+}
+
+
+class SerializerTests(TestCase):
+    def test_json(self):
+        body = JSONSerializer().dumps({"body": "one"})
+        # the same body as before serializers were configurable
+        self.assertEqual(body, json.dumps({"body": "one"}).encode("utf-8"))
+        self.assertEqual(
+            json.loads(JSONSerializer().dumps(MESSAGE)),
+            {"id": "7f4b3a4e-5f0a-4ac8-9a3c-1b7b0e9d3f10", "created": "2021-05-01T12:30:00", "body": MESSAGE["body"]},
+        )
+
+    @skipIf(serializers.orjson is None, "orjson is not installed")
+    def test_orjson(self):
+        serializer = serializers.ORJSONSerializer()
+        self.assertEqual(json.loads(serializer.dumps(MESSAGE)), json.loads(JSONSerializer().dumps(MESSAGE)))
+        self.assertIsInstance(serializers.get_json_serializer(), serializers.ORJSONSerializer)
+
+    @skipIf(serializers.msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        body = serializers.MsgPackSerializer().dumps(MESSAGE)
+        self.assertEqual(serializers.msgpack.unpackb(body)["id"], str(MESSAGE["id"]))
+
+    @skipIf(serializers.msgpack is not None, "msgpack is installed")
+    def test_missing_dependency(self):
+        with self.assertRaises(ImproperlyConfigured):
+            serializers.MsgPackSerializer()
+
+
+class MessageEncoderTests(TestCase):
+    def test_compression_threshold(self):
+        encoder = MessageEncoder(compressor=ZlibCompressor(), compression_threshold=100, app_id="test")
+        body, properties = encoder.encode({"body": "short"})
+        self.assertEqual(body, b'{"body": "short"}')
+        self.assertEqual(properties.content_type, "text/json")
+        self.assertIsNone(properties.content_encoding)
+
+        message = {"body": "long" * 100}
+        body, properties = encoder.encode(message)
+        self.assertEqual(json.loads(zlib.decompress(body)), message)
+        self.assertEqual(properties.content_type, "text/json")
+        self.assertEqual(properties.content_encoding, "deflate")
+        self.assertEqual(properties.app_id, "test")
+
+    def test_json_content_type(self):
+        encoder = MessageEncoder(JSONSerializer("application/json"))
+        body, properties = encoder.encode({"body": "short"})
+        self.assertEqual(body, b'{"body": "short"}')
+        self.assertEqual(properties.content_type, "application/json")
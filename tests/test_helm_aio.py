@@ -0,0 +1,50 @@
+import asyncio
+import subprocess
+import sys
+import time
+from unittest import TestCase
+
+from commons.helm import aio, utils
+
+# writes more than a pipe buffer to stderr before writing to stdout
+NOISY = [sys.executable, "-c", "import sys; sys.stderr.write('e' * 1000000); sys.stdout.write('done')"]
+SLOW = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+class ExecuteTests(TestCase):
+    def test_large_output_does_not_block(self):
+        process = utils.run(NOISY, cwd=None)
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(process.stdout, "done")
+        self.assertEqual(len(process.stderr), 1000000)
+
+        process = asyncio.run(aio.run(NOISY, cwd=None))
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(process.stdout, "done")
+        self.assertEqual(len(process.stderr), 1000000)
+
+    def test_execute_returns_process(self):
+        process = utils.execute([sys.executable, "-c", "print('done')"], cwd=None)
+        with process.stdout:
+            self.assertEqual(process.returncode, 0)
+            self.assertEqual(process.stdout.readlines(), ["done\n"])
+
+    def test_timeout_kills_process(self):
+        start = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            utils.run(SLOW, cwd=None, timeout=0.5)
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(aio.run(SLOW, cwd=None, timeout=0.5))
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_cancellation_kills_process(self):
+        async def cancel():
+            task = asyncio.ensure_future(aio.run(SLOW, cwd=None))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        start = time.monotonic()
+        asyncio.run(cancel())
+        self.assertLess(time.monotonic() - start, 10)
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+from commons.helm import utils
+from commons.helm.cache import DependencyCache, DjangoRenderCache, FileSystemRenderCache, render_cache_key
+from commons.helm.context_manager import HelmCharts
+from commons.helm.data_classes import AWSKMS, DeckData, PGPKey, RenderEnvironment, SopsProviderType, SpecsData
+from commons.helm.parser import HelmRepositoryParser
+
+SPECS_DATA = [
+    SpecsData(name="service.yaml", source="chart/templates/service.yaml", content="kind: Service", kind="Service")
+]
+
+
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_key_depends_on_all_inputs(self):
+        key = render_cache_key(commit="abc", values="values.yaml", parameters=["--set", "a=b"])
+        self.assertEqual(key, render_cache_key(parameters=["--set", "a=b"], values="values.yaml", commit="abc"))
+        self.assertNotEqual(key, render_cache_key(commit="abc", values="values.yaml", parameters=["--set", "a=c"]))
+
+    def test_sops_decks_are_not_cached(self):
+        environment = RenderEnvironment(specs_data=[], values_path="chart/values.yaml")
+        deck = DeckData("demo", "", "helm", "chart", {}, [environment])
+        with mock.patch.object(utils, "get_helm_version", return_value="v3.5.0"):
+            self.assertIsNotNone(HelmCharts("/tmp", deck, environment).cache_key("abc"))
+            deck.sops = PGPKey(type=SopsProviderType.PGP, private_key="key")
+            self.assertIsNone(HelmCharts("/tmp", deck, environment).cache_key("abc"))
+
+    def test_sops_decks_are_decrypted(self):
+        environment = RenderEnvironment(specs_data=[], values_path="chart/values.yaml")
+        deck = DeckData("demo", "", "helm", "chart", {}, [environment])
+        deck.sops = AWSKMS(type=SopsProviderType.AWS, access_key="key", secret_access_key="secret")
+        with mock.patch.object(utils, "check_helm_dependencies"), mock.patch.object(
+            utils, "run", return_value=subprocess.CompletedProcess([], 0, stdout="", stderr="")
+        ) as run:
+            HelmCharts("/tmp", deck, environment).render()
+        self.assertIn("secrets", run.call_args.args[0])
+
+    def test_file_system_cache(self):
+        cache = FileSystemRenderCache(self.cache_dir.name)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", SPECS_DATA)
+        self.assertEqual(cache.get("key"), SPECS_DATA)
+
+    def test_file_system_cache_eviction(self):
+        cache = FileSystemRenderCache(self.cache_dir.name)
+        cache.set("old", SPECS_DATA)
+        os.utime(os.path.join(self.cache_dir.name, "old.json"), (0, 0))
+        cache.max_size = os.path.getsize(os.path.join(self.cache_dir.name, "old.json"))
+        cache.set("new", SPECS_DATA)
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(cache.get("new"), SPECS_DATA)
+
+    def test_django_cache(self):
+        cache = DjangoRenderCache()
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", SPECS_DATA)
+        self.assertEqual(cache.get("key"), SPECS_DATA)
+
+    def test_async_render_uses_cache_off_the_event_loop(self):
+        cache = FileSystemRenderCache(self.cache_dir.name)
+        cache.set("key", SPECS_DATA)
+        threads = []
+
+        def get(key):
+            threads.append(threading.current_thread())
+            return FileSystemRenderCache.get(cache, key)
+
+        parser = HelmRepositoryParser("https://example.com/charts.git", render_cache=cache)
+        environment = RenderEnvironment(specs_data=[], values_path="chart/values.yaml")
+        deck = DeckData("demo", "", "helm", "chart", {}, [environment])
+        with mock.patch.object(parser, "_render_cache_key", return_value="key"), mock.patch.object(
+            cache, "get", side_effect=get
+        ), mock.patch.object(parser, "get_values_yaml", return_value=""):
+            asyncio.run(parser._arender_environment("/tmp", deck, environment))
+        self.assertEqual(environment.specs_data, SPECS_DATA)
+        self.assertNotIn(threading.main_thread(), threads)
+
+
+class DependencyCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.chart_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        self.chart_dir.cleanup()
+
+    def write(self, path, content):
+        full_path = os.path.join(self.chart_dir.name, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+
+    def test_digest(self):
+        self.write("Chart.yaml", "name: chart\n")
+        self.assertIsNone(utils.get_dependency_digest(self.chart_dir.name))
+        self.write(
+            "Chart.yaml", "name: chart\ndependencies:\n- name: redis\n  repository: https://charts.example.com\n"
+        )
+        digest = utils.get_dependency_digest(self.chart_dir.name)
+        self.assertIsNotNone(digest)
+        self.write("Chart.lock", "digest: sha256:1234\n")
+        self.assertNotEqual(digest, utils.get_dependency_digest(self.chart_dir.name))
+        self.write("Chart.yaml", "name: chart\ndependencies:\n- name: common\n  repository: file://../common\n")
+        self.assertIsNone(utils.get_dependency_digest(self.chart_dir.name))
+
+    def test_store_and_restore(self):
+        cache = DependencyCache(self.cache_dir.name)
+        charts_dir = os.path.join(self.chart_dir.name, "charts")
+        self.assertFalse(cache.restore("digest", charts_dir))
+        self.write("charts/redis-1.0.0.tgz", "archive")
+        cache.store("digest", charts_dir)
+
+        with tempfile.TemporaryDirectory() as checkout:
+            self.assertTrue(cache.restore("digest", os.path.join(checkout, "charts")))
+            with open(os.path.join(checkout, "charts", "redis-1.0.0.tgz")) as f:
+                self.assertEqual(f.read(), "archive")
+
+        cache.max_age = -1
+        self.assertFalse(cache.restore("digest", charts_dir))
+
+    def test_charts_without_dependencies_are_not_checked(self):
+        self.write("Chart.yaml", "name: chart\n")
+        with mock.patch.object(utils, "run") as run:
+            utils.check_helm_dependencies(self.chart_dir.name)
+        run.assert_not_called()
@@ -0,0 +1,50 @@
+import time
+from unittest import TestCase, mock
+
+from commons.helm import utils
+from commons.helm.executor import RenderExecutor, get_render_executor
+
+
+class RenderExecutorTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(utils, "get_helm_version", return_value="v3")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.executor = RenderExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_metrics(self):
+        def render(fail):
+            time.sleep(0.05)
+            if fail:
+                raise ValueError("render failed")
+            return "rendered"
+
+        first = self.executor.submit(render, False)
+        second = self.executor.submit(render, True)
+        self.assertEqual(first.result(), "rendered")
+        with self.assertRaises(ValueError):
+            second.result()
+
+        metrics = self.executor.metrics
+        self.assertEqual((metrics.submitted, metrics.completed, metrics.failed), (2, 1, 1))
+        self.assertEqual((metrics.queued, metrics.running), (0, 0))
+        # the second render waited for the only worker
+        self.assertGreaterEqual(metrics.max_queue_time, 0.04)
+        self.assertGreaterEqual(metrics.execution_time, 0.1)
+
+    def test_workers_are_started_up_front(self):
+        executor = RenderExecutor(max_workers=3)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual(len(executor._executor._threads), 3)
+        self.assertEqual(executor.submit(lambda: "rendered").result(), "rendered")
+
+    def test_executor_of_another_size_replaces_the_previous_one(self):
+        previous = get_render_executor(1)
+        self.assertIs(get_render_executor(1), previous)
+        current = get_render_executor(2)
+        self.addCleanup(current.shutdown)
+        self.assertIsNot(current, previous)
+        self.assertTrue(previous._executor._shutdown)
+        # renders submitted to a replaced executor still run
+        self.assertEqual(previous.submit(lambda: "rendered").result(), "rendered")
@@ -0,0 +1,53 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase, skipUnless
+
+from commons.helm.gpg import KeyringCache
+
+
+def generate_key(uid):
+    with tempfile.TemporaryDirectory() as homedir:
+        gpg = ["gpg", "--homedir", homedir, "--batch", "--passphrase", ""]
+        subprocess.run([*gpg, "--quick-gen-key", uid, "ed25519", "sign", "never"], check=True, capture_output=True)
+        key = subprocess.run(
+            [*gpg, "--armor", "--export-secret-keys", uid], check=True, capture_output=True, encoding="utf-8"
+        ).stdout
+        subprocess.run(["gpgconf", "--homedir", homedir, "--kill", "gpg-agent"], capture_output=True)
+    return key
+
+
+@skipUnless(shutil.which("gpg"), "gpg is not installed")
+class KeyringCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def list_secret_keys(self, homedir):
+        return subprocess.run(
+            ["gpg", "--homedir", homedir, "--batch", "--with-colons", "--list-secret-keys"],
+            capture_output=True,
+            encoding="utf-8",
+        ).stdout
+
+    def test_keyring_is_reused(self):
+        key = generate_key("test@unikube.io")
+        cache = KeyringCache(self.cache_dir.name)
+        homedir = cache.get(key)
+        self.assertEqual(os.path.basename(homedir), cache.fingerprint(key))
+        self.assertIn(cache.fingerprint(key), self.list_secret_keys(homedir))
+        self.assertEqual(cache.get(key), homedir)
+        self.assertEqual(
+            [i for i in os.listdir(self.cache_dir.name) if not i.startswith(".")], [cache.fingerprint(key)]
+        )
+
+    def test_eviction(self):
+        cache = KeyringCache(self.cache_dir.name, max_age=60)
+        first = cache.get(generate_key("first@unikube.io"))
+        os.utime(first, (0, 0))
+        second = cache.get(generate_key("second@unikube.io"))
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.isdir(second))
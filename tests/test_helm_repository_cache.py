@@ -0,0 +1,75 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from git import Actor, Repo
+
+from commons.helm.data_classes import Repository
+from commons.helm.exceptions import RepositoryBranchUnavailable
+from commons.helm.mirror import RepositoryCache
+
+AUTHOR = Actor("test", "test@unikube.io")
+
+
+class RepositoryCacheTests(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.source = Repo.init(self.source_dir.name, initial_branch="master")
+        self.commit("chart/Chart.yaml", "name: chart\n")
+        self.url = f"file://{self.source_dir.name}"
+
+    def tearDown(self):
+        self.source_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def commit(self, path, content):
+        full_path = os.path.join(self.source_dir.name, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+        self.source.index.add([path])
+        return self.source.index.commit(f"update {path}", author=AUTHOR, committer=AUTHOR)
+
+    def test_checkout_fetches_incrementally(self):
+        cache = RepositoryCache(self.cache_dir.name)
+        with cache.checkout(self.url, self.url, "master") as repo:
+            self.assertEqual(repo.head.commit.hexsha, self.source.head.commit.hexsha)
+            working_dir = repo.working_dir
+        self.assertFalse(os.path.exists(working_dir))
+        self.assertTrue(os.path.isdir(cache.mirror_path(self.url)))
+
+        new_commit = self.commit("chart/values.yaml", "a: 1\n")
+        with cache.checkout(self.url, self.url, "master") as repo:
+            self.assertEqual(repo.head.commit.hexsha, new_commit.hexsha)
+            self.assertTrue(os.path.isfile(os.path.join(repo.working_dir, "chart", "values.yaml")))
+
+    def test_unknown_branch(self):
+        repository = Repository(self.url, branch="unknown", use_cache=True)
+        with self.assertRaises(RepositoryBranchUnavailable):
+            with repository:
+                pass
+
+    def test_eviction(self):
+        cache = RepositoryCache(self.cache_dir.name, max_size=0)
+        with cache.checkout(self.url, self.url, "master"):
+            # mirrors in use are not evicted
+            cache.evict()
+            self.assertTrue(os.path.isdir(cache.mirror_path(self.url)))
+        self.assertFalse(os.path.isdir(cache.mirror_path(self.url)))
+
+    def test_pinned_commit(self):
+        cache = RepositoryCache(self.cache_dir.name)
+        pinned = self.source.head.commit
+        self.commit("chart/values.yaml", "a: 1\n")
+        with cache.checkout(self.url, self.url, "master", commit=pinned.hexsha) as repo:
+            self.assertEqual(repo.head.commit.hexsha, pinned.hexsha)
+            self.assertFalse(os.path.isfile(os.path.join(repo.working_dir, "chart", "values.yaml")))
+
+    def test_fetch_commit_into_worktree(self):
+        cache = RepositoryCache(self.cache_dir.name)
+        with cache.checkout(self.url, self.url, "master") as repo:
+            new_commit = self.commit("chart/values.yaml", "a: 1\n")
+            cache.fetch_commit(self.url, self.url, new_commit.hexsha)
+            # the worktree shares the objects of the mirror
+            self.assertIn("chart/values.yaml", repo.git.diff("--name-only", repo.head.commit.hexsha, new_commit.hexsha))
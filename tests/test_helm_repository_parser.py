@@ -1,11 +1,18 @@
-from unittest import TestCase
+import os
+import tempfile
+from unittest import TestCase, mock
 
 import requests
 import yaml
+from git import Actor, Repo
 
 from commons.helm import utils
+from commons.helm.conf import config
 from commons.helm.data_classes import DeckData, RenderEnvironment
-from commons.helm.parser import HelmRepositoryParser
+from commons.helm.exceptions import HelmChartRenderErrors
+from commons.helm.mirror import RepositoryCache
+from commons.helm.parser import ChartYamlParser, HelmRepositoryParser, SpecsParser
+from commons.helm.tree import GitTreeReader, WorkingTreeReader
 
 GIT_REPO_URL = "https://github.com/Blueshoe/buzzword-charts.git"
 deck_data_check = [
@@ -54,6 +61,52 @@ class HelmRepositoryParserTests(TestCase):
         params = utils.get_additional_render_parameters(deck, environment)
         self.assertIn("b.d[0].name=first", params)
 
+    def test_flatten_escapes_keys(self):
+        values = {"labels": {"app.kubernetes.io/name": "web"}, "a": {"b=c": [{"d": 1}, "e"]}, "empty": {}}
+        self.assertEqual(
+            utils.flatten(values),
+            {"labels.app\\.kubernetes\\.io/name": "web", "a.b\\=c[0].d": 1, "a.b\\=c[1]": "e"},
+        )
+
+    def test_override_values_are_nested(self):
+        environment = RenderEnvironment(specs_data=[], values_path="buzzword-counter/values.yaml")
+        environment.update_values_from_yaml("a: {b.c: 'x,y=z', d: [1, {e: '2'}]}\ng: 'true'")
+        environment.set_value("f", "true")
+        self.assertEqual(
+            utils.unflatten(environment.override_values),
+            {"a": {"b.c": "x,y=z", "d": [1, {"e": "2"}]}, "g": "true", "f": True},
+        )
+        deck = DeckData("Test", "test", "test", "dir/path", {}, [])
+        self.assertNotIn("--set", utils.get_additional_render_parameters(deck, environment, override_values=False))
+
+    def test_override_values_are_typed_like_helm(self):
+        values = {
+            "replicaCount": "0",
+            "enabled": "True",
+            "debug": "FALSE",
+            "image": "Null",
+            "port": "-8080",
+            "tag": "007",
+            "big": "9223372036854775808",
+            "max": "9223372036854775807",
+        }
+        environment = RenderEnvironment(specs_data=[], values_path="buzzword-counter/values.yaml")
+        for key, value in values.items():
+            environment.set_value(key, value)
+        self.assertEqual(
+            utils.unflatten(environment.override_values),
+            {
+                "replicaCount": 0,
+                "enabled": True,
+                "debug": False,
+                "image": None,
+                "port": -8080,
+                "tag": "007",
+                "big": "9223372036854775808",
+                "max": 9223372036854775807,
+            },
+        )
+
     def test_yaml_files_merging(self):
         yaml1 = """
           a: Anna
@@ -125,3 +178,202 @@ class HelmRepositoryParserTests(TestCase):
         deck_hash = "c586a647818175e36bd0b17ab9a726a73e526fd3e3930205c60f90defee45f9e"
         specs_data = parser.get_specs(deck_hash, sops=None, environment=environment)
         self.assertTrue(bool(specs_data))
+
+    def test_session_uses_single_checkout(self):
+        with HelmRepositoryParser(GIT_REPO_URL) as parser:
+            parser.parse()
+            deck = parser.deck_data[0]
+            environment = RenderEnvironment(specs_data=[], values_path="buzzword-counter/values.yaml")
+            result = parser.render(*[(deck, environment)])
+            deck, updated_environment = result[0]
+            self.assertTrue(bool(updated_environment.specs_data))
+            specs_data = parser.get_specs(deck.hash, sops=None, environment=environment)
+            self.assertTrue(bool(specs_data))
+            self.assertEqual(len(parser.deck_data), len(deck_data_check))
+
+    def test_concurrent_render_collects_errors(self):
+        parser = HelmRepositoryParser(GIT_REPO_URL)
+        parser.parse()
+        deck = parser.deck_data[0]
+        environment = RenderEnvironment(specs_data=[], values_path="buzzword-counter/values.yaml")
+        broken_environment = RenderEnvironment(specs_data=[], values_path="buzzword-counter/does-not-exist.yaml")
+        with self.assertRaises(HelmChartRenderErrors) as cm:
+            parser.render((deck, broken_environment), (deck, environment), max_workers=2)
+        self.assertEqual(len(cm.exception.errors), 1)
+        self.assertIs(cm.exception.errors[0][1], broken_environment)
+        self.assertEqual(len(cm.exception.result), 1)
+        self.assertTrue(bool(cm.exception.result[0][1].specs_data))
+
+    def test_specs_parser_splits_documents(self):
+        rendered = (
+            "---\n"
+            "# Source: chart/templates/configmap.yaml\n"
+            "kind: ConfigMap\n"
+            "data:\n"
+            "  banner: |\n"
+            "    ---- not a document marker ---\n"
+            "---\n"
+            "# Source: chart/templates/service.yaml\n"
+            "kind: Service\n"
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml") as f:
+            f.write(rendered)
+            f.flush()
+            specs = SpecsParser.read_specs(f.name)
+        self.assertEqual([i.kind for i in specs], ["ConfigMap", "Service"])
+        self.assertEqual(specs[0].source, "chart/templates/configmap.yaml")
+        self.assertIn("---- not a document marker ---", specs[0].content)
+
+    def test_specs_parser_reads_stream(self):
+        rendered = (
+            "---\n"
+            "# Source: chart/templates/configmap.yaml\n"
+            "kind: ConfigMap\n"
+            "---\n"
+            "# Source: chart/templates/service.yaml\n"
+            "kind: Service\n"
+        )
+        specs = SpecsParser.read_stream_specs(rendered)
+        self.assertEqual([i.name for i in specs], ["configmap.yaml", "service.yaml"])
+        self.assertEqual([i.kind for i in specs], ["ConfigMap", "Service"])
+
+    def test_specs_parser_extracts_metadata(self):
+        spec = (
+            "\n"
+            "# Source: chart/templates/deployment.yaml\n"
+            "apiVersion: apps/v1\n"
+            "kind: Deployment\n"
+            "metadata:\n"
+            '  name: "web"\n'
+            "  labels:\n"
+            "    name: label\n"
+            "  namespace: production\n"
+            "spec:\n"
+            "  template:\n"
+            "    metadata:\n"
+            "      name: template\n"
+        )
+        metadata = SpecsParser.extract_metadata(spec)
+        self.assertEqual(metadata["source"], "chart/templates/deployment.yaml")
+        self.assertEqual(metadata["kind"], "Deployment")
+        self.assertEqual(metadata["api_version"], "apps/v1")
+        self.assertEqual(metadata["resource_name"], "web")
+        self.assertEqual(metadata["namespace"], "production")
+        self.assertIsNone(SpecsParser.extract_metadata("kind: List\n")["source"])
+
+    def test_specs_parser_extracts_metadata_after_other_keys(self):
+        spec = (
+            "\n"
+            "data:\n"
+            "  kind: value\n"
+            "metadata:\n"
+            "  # comment\n"
+            "  name: 'settings' # comment\n"
+            "kind: ConfigMap\n"
+        )
+        metadata = SpecsParser.extract_metadata(spec)
+        self.assertEqual(metadata["kind"], "ConfigMap")
+        self.assertEqual(metadata["resource_name"], "settings")
+        self.assertIsNone(metadata["namespace"])
+
+    def test_specs_parser_loads_inline_metadata(self):
+        specs = SpecsParser.read_stream_specs("apiVersion: v1\nmetadata: {name: cm}\nkind: ConfigMap\n")
+        self.assertEqual([(i.kind, i.api_version, i.resource_name) for i in specs], [("ConfigMap", "v1", "cm")])
+        specs = SpecsParser.read_stream_specs("metadata: &m\n  name: a\nkind: K\n")
+        self.assertEqual([(i.kind, i.resource_name, i.namespace) for i in specs], [("K", "a", None)])
+
+    def test_sops_detection(self):
+        encrypted = (
+            b"password: ENC[AES256_GCM,data:abc]\nsops:\n    kms: []\n    pgp:\n    -   fp: ABCDEF\nother: value\n"
+        )
+        self.assertEqual(ChartYamlParser.get_sops_providers(utils.git_blob_sha(encrypted), encrypted), ["pgp"])
+        plain = b"sopsy: false\nnested:\n  sops:\n    pgp: [1]\n"
+        self.assertIsNone(ChartYamlParser.get_sops_providers(utils.git_blob_sha(plain), plain))
+        # git hash-object of an empty file
+        self.assertEqual(utils.git_blob_sha(b""), "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391")
+
+
+class IncrementalParseTests(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.TemporaryDirectory()
+        self.source = Repo.init(self.source_dir.name, initial_branch="master")
+        self.commit("first/Chart.yaml", "name: first\n")
+        self.commit("second/Chart.yaml", "name: second\n")
+        self.url = f"file://{self.source_dir.name}"
+
+    def tearDown(self):
+        self.source_dir.cleanup()
+
+    def commit(self, path, content):
+        full_path = os.path.join(self.source_dir.name, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+        self.source.index.add([path])
+        author = Actor("test", "test@unikube.io")
+        return self.source.index.commit(f"update {path}", author=author, committer=author)
+
+    def test_only_changed_decks_are_parsed(self):
+        parser = HelmRepositoryParser(self.url)
+        parser.parse()
+        previous_commit = parser.repository_data.current_commit.hexsha
+        previous_deck_data = list(parser.deck_data)
+        first, second = sorted(previous_deck_data, key=lambda deck: deck.title)
+
+        self.commit("second/values.yaml", "a: 1\n")
+        self.commit("third/Chart.yaml", "name: third\n")
+        parser = HelmRepositoryParser(self.url)
+        parser.parse(previous_commit=previous_commit, previous_deck_data=previous_deck_data)
+        decks = {deck.title: deck for deck in parser.deck_data}
+        self.assertEqual(sorted(decks), ["first", "second", "third"])
+        self.assertIs(decks["first"], first)
+        self.assertIsNot(decks["second"], second)
+        self.assertIn("/second/values.yaml", [i["path"] for i in decks["second"].file_information["information"]])
+
+    def test_previous_commit_is_fetched_into_repository_cache(self):
+        parser = HelmRepositoryParser(self.url)
+        parser.parse()
+        previous_commit = parser.repository_data.current_commit.hexsha
+        previous_deck_data = list(parser.deck_data)
+
+        self.commit("second/values.yaml", "a: 1\n")
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.object(config, "CACHE_DIR", cache_dir):
+            parser = HelmRepositoryParser(self.url, use_cache=True)
+            # the new shallow mirror only contains the latest commit
+            with mock.patch.object(RepositoryCache, "fetch_commit", wraps=RepositoryCache().fetch_commit) as fetch:
+                parser.parse(previous_commit=previous_commit, previous_deck_data=previous_deck_data)
+        fetch.assert_called_once()
+        decks = {deck.title: deck for deck in parser.deck_data}
+        self.assertIs(decks["first"], next(deck for deck in previous_deck_data if deck.title == "first"))
+        self.assertIn("/second/values.yaml", [i["path"] for i in decks["second"].file_information["information"]])
+
+    def test_git_tree_reader_matches_working_tree(self):
+        self.commit("second/helm_vars/development/values.yaml", "a: 1\n")
+        git_reader = GitTreeReader(self.source.head.commit.tree)
+        working_tree_reader = WorkingTreeReader(self.source_dir.name)
+        self.assertEqual(sorted(git_reader.walk()), sorted(working_tree_reader.walk()))
+        path = "second/helm_vars/development/values.yaml"
+        self.assertEqual(git_reader.read(path), working_tree_reader.read(path))
+        self.assertEqual(git_reader.blob_sha(path), working_tree_reader.blob_sha(path))
+        self.assertEqual(git_reader.blob(path)[0], working_tree_reader.blob(path)[0])
+        self.assertTrue(git_reader.isdir("second/helm_vars"))
+        self.assertFalse(git_reader.isfile("second/helm_vars"))
+
+    def test_working_tree_files_are_read_once(self):
+        self.commit("second/values.yaml", "a: 1\n")
+        reader = WorkingTreeReader(self.source_dir.name)
+        with mock.patch.object(reader, "read", wraps=reader.read) as read:
+            information = ChartYamlParser(self.source_dir.name, reader)._get_file_information("second", "values.yaml")
+        self.assertFalse(information.encrypted)
+        read.assert_called_once_with("second/values.yaml")
+
+    def test_parse_without_working_tree(self):
+        parser = HelmRepositoryParser(self.url)
+        parser.parse()
+        with_checkout = HelmRepositoryParser(self.url)
+        with with_checkout:
+            with_checkout.parse()
+        self.assertEqual(
+            sorted((deck.title, deck.hash) for deck in parser.deck_data),
+            sorted((deck.title, deck.hash) for deck in with_checkout.deck_data),
+        )
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase, mock
+
+from commons.keycloak.aio import AsyncKeycloakClient
+from commons.keycloak.groups import GroupHandler
+from commons.keycloak.resources import ResourceHandler
+
+
+class AsyncKeycloakClientTests(TestCase):
+    def setUp(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def slow_call(self, result):
+        def call(*args, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.2)
+            with self.lock:
+                self.running -= 1
+            return result
+
+        return call
+
+    def test_calls_run_concurrently(self):
+        async def create_groups():
+            async with AsyncKeycloakClient(token="token") as client:
+                return await asyncio.gather(client.groups.create("admins"), client.groups.create("members"))
+
+        with mock.patch.object(GroupHandler, "create", side_effect=self.slow_call("group")):
+            start = time.monotonic()
+            self.assertEqual(asyncio.run(create_groups()), ["group", "group"])
+        self.assertLess(time.monotonic() - start, 0.35)
+        self.assertEqual(self.max_running, 2)
+
+    def test_concurrency_limit(self):
+        async def read_resources():
+            async with AsyncKeycloakClient(max_concurrency=3, token="token") as client:
+                return await asyncio.gather(*(client.resources.get(str(i)) for i in range(9)))
+
+        with mock.patch("commons.keycloak.resources.get_uma_client"):
+            with mock.patch.object(ResourceHandler, "get", side_effect=self.slow_call({"name": "resource"})):
+                self.assertEqual(asyncio.run(read_resources()), [{"name": "resource"}] * 9)
+        self.assertEqual(self.max_running, 3)
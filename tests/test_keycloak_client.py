@@ -100,6 +100,17 @@ class KeycloakClientTests(SimpleTestCase):
         self.assertEqual(status, 204)
         self.assertIs(uh.count_groups(self.__class__.user_id), 0)
 
+    def test_d3b_sync_group_members(self):
+        uh = UserHandler()
+        gh = GroupHandler()
+        group_id = gh.create("team_group")
+        results = uh.sync_group_members(group_id, [self.__class__.user_id])
+        self.assertEqual(results[self.__class__.user_id].status_code, 204)
+        self.assertEqual(gh.member_ids(group_id), {self.__class__.user_id})
+        results = uh.sync_group_members(group_id, [])
+        self.assertEqual(results[self.__class__.user_id].action, "left")
+        self.assertEqual(gh.member_ids(group_id), set())
+
     def test_d4_delete_user(self):
         uh = UserHandler()
         status = uh.delete(self.__class__.user_id)
@@ -0,0 +1,77 @@
+from unittest import TestCase, mock
+
+from requests import HTTPError, Response
+
+from commons.keycloak.groups import GroupHandler
+from commons.keycloak.users import JOINED, LEFT, UNCHANGED, UserHandler
+
+
+class FakeGroup:
+    """Keeps the members of a single group in memory, like Keycloak it returns them page by page."""
+
+    def __init__(self, members, failing=()):
+        self.members = set(members)
+        self.failing = set(failing)
+        self.calls = []
+
+    def page(self, url, params=None, **kwargs):
+        first, max_results = params["first"], params["max"]
+        self.calls.append(("members", first, max_results))
+        return {"data": [{"id": user_id} for user_id in sorted(self.members)][first : first + max_results]}
+
+    def request(self, action):
+        def call(user_id, group_id):
+            self.calls.append((action, user_id))
+            if user_id in self.failing:
+                response = Response()
+                response.status_code = 404
+                raise HTTPError(response=response)
+            getattr(self.members, action)(user_id)
+            return 204
+
+        return call
+
+
+class MembershipTests(TestCase):
+    def patch(self, group):
+        patchers = [
+            mock.patch.object(GroupHandler, "_call_api", side_effect=group.page),
+            mock.patch.object(UserHandler, "join_group", side_effect=group.request("add")),
+            mock.patch.object(UserHandler, "leave_group", side_effect=group.request("discard")),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_join_groups(self):
+        group = FakeGroup([f"user{i:03}" for i in range(150)], failing=["unknown"])
+        self.patch(group)
+        results = UserHandler(token="token").join_groups(["user001", "user200", "unknown", "user200"], "group")
+        self.assertEqual(list(results), ["user001", "user200", "unknown"])
+        self.assertEqual(results["user001"].action, UNCHANGED)
+        self.assertEqual((results["user200"].action, results["user200"].status_code), (JOINED, 204))
+        self.assertFalse(results["unknown"].ok)
+        self.assertEqual(results["unknown"].status_code, 404)
+        self.assertIn("user200", group.members)
+        # all members were requested in pages of 100 before joining
+        self.assertEqual(
+            [call for call in group.calls if call[0] == "members"], [("members", 0, 100), ("members", 100, 100)]
+        )
+
+    def test_sync_group_members(self):
+        group = FakeGroup(["user1", "user2", "user3"])
+        self.patch(group)
+        results = UserHandler(token="token").sync_group_members("group", ["user2", "user3", "user4"], max_concurrency=2)
+        self.assertEqual(group.members, {"user2", "user3", "user4"})
+        self.assertEqual(
+            {user_id: result.action for user_id, result in results.items()},
+            {"user1": LEFT, "user2": UNCHANGED, "user3": UNCHANGED, "user4": JOINED},
+        )
+        self.assertEqual(len([call for call in group.calls if call[0] != "members"]), 2)
+
+    def test_leave_groups(self):
+        group = FakeGroup(["user1", "user2"])
+        self.patch(group)
+        results = UserHandler(token="token").leave_groups(["user1", "user3"], "group")
+        self.assertEqual(group.members, {"user2"})
+        self.assertEqual((results["user1"].action, results["user3"].action), (LEFT, UNCHANGED))
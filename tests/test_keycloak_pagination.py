@@ -0,0 +1,42 @@
+import threading
+from unittest import TestCase, mock
+
+from commons.keycloak.groups import GroupHandler
+from commons.keycloak.users import UserHandler
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.items = [{"id": str(i)} for i in range(250)]
+        self.requests = []
+        self.requested = threading.Event()
+
+    def call_api(self, url, params=None, **kwargs):
+        self.requests.append((url.rsplit("/", 1)[-1], params))
+        if len(self.requests) == 2:
+            self.requested.set()
+        return {"data": self.items[params["first"] : params["first"] + params["max"]]}
+
+    def test_members_are_paged(self):
+        with mock.patch.object(GroupHandler, "_call_api", side_effect=self.call_api):
+            members = GroupHandler(token="token").members("group")
+        self.assertEqual(members, self.items)
+        self.assertEqual(
+            [params for _, params in self.requests],
+            [{"first": 0, "max": 100}, {"first": 100, "max": 100}, {"first": 200, "max": 100}],
+        )
+
+    def test_next_page_is_prefetched(self):
+        with mock.patch.object(GroupHandler, "_call_api", side_effect=self.call_api):
+            members = GroupHandler(token="token").iter_members("group", page_size=200, brief=True)
+            self.assertEqual(next(members), {"id": "0"})
+            # the second page is requested while the first one is consumed
+            self.assertTrue(self.requested.wait(5))
+            self.assertEqual(len(list(members)), 249)
+        self.assertEqual(self.requests[1], ("members", {"briefRepresentation": "true", "first": 200, "max": 200}))
+
+    def test_single_page(self):
+        with mock.patch.object(UserHandler, "_call_api", side_effect=self.call_api):
+            groups = UserHandler(token="token").groups("user", first=10, max_results=5, brief=False)
+        self.assertEqual(groups, self.items[10:15])
+        self.assertEqual(self.requests, [("groups", {"first": 10, "max": 5, "briefRepresentation": "false"})])
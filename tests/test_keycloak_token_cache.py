@@ -0,0 +1,61 @@
+import threading
+import time
+from unittest import TestCase, mock
+
+from commons.keycloak import client
+from commons.keycloak.client import TokenCache
+
+
+class TokenCacheTests(TestCase):
+    def setUp(self):
+        self.requests = 0
+
+    def fetch(self, expires_in=300, delay=0):
+        def fetch():
+            self.requests += 1
+            time.sleep(delay)
+            return {"access_token": f"token{self.requests}", "expires_in": expires_in}
+
+        return fetch
+
+    def test_token_is_cached(self):
+        cache = TokenCache(self.fetch())
+        self.assertEqual(cache.get(), "token1")
+        self.assertEqual(cache.get(), "token1")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.invalidate()
+        self.assertEqual(cache.get(), "token2")
+
+    def test_token_is_refreshed_before_expiry(self):
+        cache = TokenCache(self.fetch(expires_in=300))
+        with mock.patch.object(client.time, "monotonic", return_value=1000):
+            self.assertEqual(cache.get(), "token1")
+        with mock.patch.object(client.time, "monotonic", return_value=1000 + 300 - client.config.TOKEN_REFRESH_MARGIN):
+            self.assertEqual(cache.get(), "token2")
+
+    def test_configuration_change(self):
+        cache = TokenCache(self.fetch())
+        cache.get()
+        with mock.patch.object(client.config, "REALM_NAME", "other"):
+            self.assertEqual(cache.get(), "token2")
+
+    def test_single_flight(self):
+        cache = TokenCache(self.fetch(delay=0.2))
+        tokens = []
+        threads = [threading.Thread(target=lambda: tokens.append(cache.get())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tokens, ["token1"] * 10)
+        self.assertEqual(self.requests, 1)
+        self.assertEqual((cache.hits, cache.misses), (9, 1))
+
+    def test_valid_token_is_used_while_refreshing(self):
+        cache = TokenCache(self.fetch(expires_in=300))
+        with mock.patch.object(client.time, "monotonic", return_value=1000):
+            cache.get()
+        with mock.patch.object(client.time, "monotonic", return_value=1290):
+            with cache._lock:
+                # another thread refreshes the token right now
+                self.assertEqual(cache.get(), "token1")
@@ -0,0 +1,94 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase, mock
+
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from commons.keycloak import transport
+from commons.keycloak.transport import KeycloakSession
+
+
+class Handler(BaseHTTPRequestHandler):
+    def _respond(self):
+        self.server.methods.append(self.command)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == "slow":
+            self.server.release.wait(5)
+            status = 200
+        elif status == "close":
+            # the request was sent, but the connection is lost before a response
+            self.close_connection = True
+            return
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class KeycloakSessionTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.statuses = []
+        self.server.methods = []
+        self.server.release = threading.Event()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.server.release.set)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        patcher = mock.patch.object(transport.time, "sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_idempotent_requests_are_retried(self):
+        self.server.statuses = [503, 502]
+        session = KeycloakSession(retries=2)
+        self.assertEqual(session.get(self.url).status_code, 200)
+        self.assertEqual(self.server.methods, ["GET"] * 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        metrics = session.metrics
+        self.assertEqual((metrics.requests, metrics.retries, metrics.failures), (3, 2, 2))
+        self.assertGreater(metrics.average_latency, 0)
+
+        self.server.statuses = [503, 503, 503]
+        self.assertEqual(session.put(self.url).status_code, 503)
+
+    def test_post_is_not_retried(self):
+        self.server.statuses = [503]
+        session = KeycloakSession(retries=2)
+        self.assertEqual(session.post(self.url).status_code, 503)
+        self.assertEqual(self.server.methods, ["POST"])
+
+    def test_timeout(self):
+        self.server.statuses = ["slow", "slow"]
+        session = KeycloakSession(timeout=0.2, retries=1)
+        with self.assertRaises(ReadTimeout):
+            session.get(self.url)
+        self.assertEqual(self.server.methods, ["GET"] * 2)
+        # a per call timeout overrides the default one
+        self.server.release.set()
+        self.assertEqual(session.get(self.url, timeout=5).status_code, 200)
+
+    def test_connection_error(self):
+        session = KeycloakSession(retries=1)
+        with self.assertRaises(ConnectionError):
+            session.get("http://127.0.0.1:1/")
+        self.assertEqual(session.metrics.retries, 1)
+
+    def test_post_is_retried_if_the_connection_is_refused(self):
+        session = KeycloakSession(retries=1)
+        with self.assertRaises(ConnectionError):
+            session.post("http://127.0.0.1:1/")
+        self.assertEqual(session.metrics.retries, 1)
+
+    def test_post_is_not_retried_if_the_connection_is_lost(self):
+        self.server.statuses = ["close"]
+        session = KeycloakSession(retries=1)
+        with self.assertRaises(ConnectionError):
+            session.post(self.url)
+        self.assertEqual(self.server.methods, ["POST"])
+        self.assertEqual(session.metrics.retries, 0)